@@ -0,0 +1,73 @@
+import time
+import sqlite3
+import threading
+
+
+class CheckpointStore:
+    """Local store of how far each row of an upload got, keyed by the hash of the file it came from, so a restarted upload can skip
+    the rows which already succeeded"""
+
+    def __init__(self, path):
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints "
+            + "(fileHash TEXT, stage TEXT, row INTEGER, status TEXT, updatedAt REAL, PRIMARY KEY (fileHash, stage, row))"
+        )
+        self.connection.commit()
+
+    #  ---------------------------------------------------------------------
+
+    def get(self, fileHash, stage):
+        """Returns a dict of {row: status} for every row of the file which has a checkpoint at the given stage"""
+
+        with self.lock:
+
+            found = self.connection.execute(
+                "SELECT row, status FROM checkpoints WHERE fileHash = ? AND stage = ?", (fileHash, stage)
+            )
+
+            return dict(found.fetchall())
+
+    #  ---------------------------------------------------------------------
+
+    def mark(self, fileHash, stage, rows, status):
+        """Sets the status of the given rows at the given stage, or removes their checkpoints if status is None"""
+
+        with self.lock:
+
+            if status is None:
+                self.connection.executemany(
+                    "DELETE FROM checkpoints WHERE fileHash = ? AND stage = ? AND row = ?",
+                    [(fileHash, stage, row) for row in rows],
+                )
+
+            else:
+                now = time.time()
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?)",
+                    [(fileHash, stage, row, status, now) for row in rows],
+                )
+
+            self.connection.commit()
+
+    #  ---------------------------------------------------------------------
+
+    def clear(self, fileHash=None, stage=None):
+        """Forgets the checkpoints of the given file (and stage), or every checkpoint if no file is given"""
+
+        with self.lock:
+
+            self.connection.execute(
+                "DELETE FROM checkpoints WHERE (? IS NULL OR fileHash = ?) AND (? IS NULL OR stage = ?)",
+                (fileHash, fileHash, stage, stage),
+            )
+            self.connection.commit()
+
+    #  ---------------------------------------------------------------------
+
+    def close(self):
+
+        with self.lock:
+            self.connection.close()
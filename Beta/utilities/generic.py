@@ -2,9 +2,147 @@ class Generic:
     def __init__(self):
         pass
 
+    def toDict(self):
+        """Returns the attributes of the object as a dict, as they are sent to OpS"""
+
+        return dict(vars(self))
+
 
 class Extension:
 
+    __slots__ = ("attrsMap",)
+
     #  needs to default to dict or recieve this error: {"code":"INVALID_REQUEST","message":"JSON parse error: null; nested exception is com.fasterxml.jackson.databind.JsonMappingException: N/A\n at [Source: "}
     def __init__(self, attrsMap=dict):
-        self.attrsMap = attrsMap
\ No newline at end of file
+        self.attrsMap = attrsMap
+
+    def toDict(self):
+        """Returns the object as a dict, as it is sent to OpS"""
+
+        return {"attrsMap": self.attrsMap}
+
+
+class Payload:
+    """Base of the fixed shape payload classes below, which use slots rather than a dict per object -- only the attributes which
+    have been set are sent, in the order they are listed in __slots__"""
+
+    __slots__ = ()
+
+    def __init__(self, **attrs):
+        for key, val in attrs.items():
+            setattr(self, key, val)
+
+    def toDict(self):
+        """Returns the attributes which have been set as a dict, as they are sent to OpS"""
+
+        return {key: getattr(self, key) for key in self.__slots__ if hasattr(self, key)}
+
+
+class ParticipantPayload(Payload):
+
+    __slots__ = (
+        "firstName",
+        "middleName",
+        "lastName",
+        "uid",
+        "birthDate",
+        "vitalStatus",
+        "deathDate",
+        "gender",
+        "activityStatus",
+        "empi",
+        "code",
+        "races",
+        "ethnicities",
+        "pmis",
+        "extensionDetail",
+    )
+
+
+class RegistrationPayload(Payload):
+
+    __slots__ = (
+        "registrationDate",
+        "activityStatus",
+        "ppid",
+        "externalSubjectId",
+        "code",
+        "cpShortTitle",
+        "participant",
+    )
+
+
+class VisitPayload(Payload):
+
+    __slots__ = (
+        "name",
+        "eventId",
+        "eventLabel",
+        "ppid",
+        "cpTitle",
+        "cpShortTitle",
+        "clinicalStatus",
+        "activityStatus",
+        "status",
+        "missedReason",
+        "missedBy",
+        "surgicalPathologyNumber",
+        "cohort",
+        "visitDate",
+        "eventPoint",
+        "site",
+        "comments",
+        "code",
+        "extensionDetail",
+        "clinicalDiagnoses",
+    )
+
+
+class SpecimenPayload(Payload):
+
+    __slots__ = (
+        "label",
+        "specimenClass",
+        "type",
+        "anatomicSite",
+        "pathology",
+        "lineage",
+        "initialQty",
+        "availableQty",
+        "laterality",
+        "collectionStatus",
+        "activityStatus",
+        "createdOn",
+        "comments",
+        "concentration",
+        "barcode",
+        "visitName",
+        "Id",
+        "visitId",
+        "parentId",
+        "storageLocation",
+        "biohazards",
+        "collectionEvent",
+        "receivedEvent",
+        "extensionDetail",
+    )
+
+
+class ArrayPayload(Payload):
+
+    __slots__ = (
+        "name",
+        "length",
+        "width",
+        "thickness",
+        "numberOfRows",
+        "rowLabelingScheme",
+        "numberOfColumns",
+        "columnLabelingScheme",
+        "coreDiameter",
+        "creationDate",
+        "status",
+        "qualityControl",
+        "comments",
+        "id",
+    )
@@ -0,0 +1,87 @@
+import json
+import time
+import sqlite3
+import threading
+
+
+class IdentityIndex:
+    """Local store of the rows OpS returns when matching a key (specimen label, PPID, eMPI, etc.), so repeat loads can skip the look up"""
+
+    def __init__(self, path):
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS identities (kind TEXT, key TEXT, rows TEXT, updatedAt REAL, PRIMARY KEY (kind, key))"
+        )
+        self.connection.commit()
+
+    #  ---------------------------------------------------------------------
+
+    def get(self, kind, keys):
+        """Returns a dict of {key: rows} for those keys which are in the index"""
+
+        found = {}
+
+        with self.lock:
+
+            #  sqlite limits the number of parameters per statement, so keys are looked up in batches
+            for n in range(0, len(keys), 500):
+
+                batch = keys[n : n + 500]
+                query = f"SELECT key, rows FROM identities WHERE kind = ? AND key IN ({', '.join(['?'] * len(batch))})"
+                found.update({key: json.loads(rows) for key, rows in self.connection.execute(query, [kind] + batch)})
+
+        return found
+
+    #  ---------------------------------------------------------------------
+
+    def replace(self, kind, identities):
+        """Stores the rows for each key given as {key: rows}, replacing whatever was known about those keys"""
+
+        now = time.time()
+
+        with self.lock:
+
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO identities VALUES (?, ?, ?, ?)",
+                [(kind, key, json.dumps(rows), now) for key, rows in identities.items()],
+            )
+            self.connection.commit()
+
+    #  ---------------------------------------------------------------------
+
+    def add(self, kind, key, row):
+        """Adds a single row for a key, such as one for a newly created record, keeping any rows already known for it"""
+
+        with self.lock:
+
+            existing = self.connection.execute(
+                "SELECT rows FROM identities WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+            rows = json.loads(existing[0]) if existing else []
+
+            if row not in rows:
+                rows.append(row)
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO identities VALUES (?, ?, ?, ?)", (kind, key, json.dumps(rows), time.time())
+            )
+            self.connection.commit()
+
+    #  ---------------------------------------------------------------------
+
+    def clear(self, kind=None):
+        """Forgets everything of the given kind, or everything in the index if no kind is given"""
+
+        with self.lock:
+
+            self.connection.execute("DELETE FROM identities WHERE ? IS NULL OR kind = ?", (kind, kind))
+            self.connection.commit()
+
+    #  ---------------------------------------------------------------------
+
+    def close(self):
+
+        with self.lock:
+            self.connection.close()
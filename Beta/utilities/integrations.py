@@ -1,29 +1,71 @@
 import os
+import re
+import hashlib
 import json  # may be required for workflow functions - investigate removing and replacing with HTTPX reply.json() or something
 import time  # required for metric logging
 import httpx
 import pstats  # required for profiling - can be omitted in release if desired
 import shutil
 import asyncio
+import threading
 import cProfile  # required for profiling - can be omitted in release if desired
 
 import pandas as pd
-import jsonpickle as jp
 
 from generic import *
 from tqdm import tqdm
+from types import MappingProxyType
 from datetime import datetime
 from settings import Settings
+from journal import RecordJournal
+from checkpoint import CheckpointStore
+from serialization import encodeBody, encodeBodies
+from identity import IdentityIndex
+from transport import (
+    ConcurrencyController,
+    RateLimiter,
+    RequestCoalescer,
+    ResponseCache,
+    RetryPolicy,
+    TokenManager,
+    getEventLoop,
+    rewindFiles,
+)
 
 #  can be enabled for uploads if/when OpS can handle async requests without crashing -- uncomment the requisite code below
 from concurrent.futures import ThreadPoolExecutor
 
+try:
+    import pyarrow  # optional -- only required if Settings.tableFormat is "parquet"
+
+except ImportError:
+    pyarrow = None
+
 
 class Integration(Settings):
     def __init__(self):
 
         super().__init__()
         self.currentEnv = None
+        self.recordLock = threading.Lock()
+        self.clientLock = threading.Lock()
+        self.identityLock = threading.Lock()
+        self.clients = {}
+        self.asyncClients = {}
+        self.concurrency = ConcurrencyController(
+            self.asyncChunkSize, self.minAsyncChunkSize, self.maxAsyncChunkSize, self.latencySpikeFactor
+        )
+        self.retryPolicy = RetryPolicy(self.retryAttempts, self.retryBaseDelay, self.retryMaxDelay, self.retryBudget)
+        self.rateLimiter = RateLimiter(self.rateLimits, self.envRateLimits)
+        self.coalescer = RequestCoalescer(self.coalesceTTL)
+        self.identityIndexes = {}
+        self.recordJournal = None
+        self.extensionPlans = {}
+        self.registryLookups = {}
+        self.currentFileHash = None
+        self.streamingFile = False
+        self.checkpoints = CheckpointStore(self.checkpointPath)
+        self.responseCache = ResponseCache(self.responseCachePath, self.responseCacheTTLs, self.responseCacheMaxEntries)
         self.authTokens = self.getTokens()
 
     #  ---------------------------------------------------------------------
@@ -43,53 +85,244 @@ class Integration(Settings):
     #  NOTE Integrations and syncing functions start here
     #  ---------------------------------------------------------------------
 
-    def renewTokens(self) -> None:  #  probably not an especially relevant or useful function -- just use getTokens...
-        """Renews tokens for all OpS envs specified in Settings by invoking the getTokens function"""
+    def renewTokens(self) -> None:
+        """Renews tokens for all OpS envs which have been logged in to so far -- tokens are otherwise refreshed automatically"""
 
-        self.authTokens = self.getTokens()
+        self.authTokens.refreshAll()
 
     #  ---------------------------------------------------------------------
 
     def getTokens(self):
-        """Asynchronously fetches tokens for all OpS envs given in Settings"""
+        """Returns a token manager for the OpS envs given in Settings, which logs in to each env the first time it is used"""
+
+        return TokenManager(self.envs, self.baseURL, self.authExtension, self.tokenRefreshAfter, self.requestTimeout)
+
+    #  ---------------------------------------------------------------------
+
+    def runAsync(self, coro):
+        """Runs a coroutine on the event loop shared by every Integration, and waits for its result"""
+
+        return getEventLoop().run(coro)
+
+    #  ---------------------------------------------------------------------
+
+    def getClient(self, env):
+        """Returns the pooled HTTP client for the given OpS env, creating it on first use so connections are reused across requests"""
+
+        #  look ups run concurrently (see lookUpChunks), so the first requests to an env mustn't each create a client
+        with self.clientLock:
 
-        async def tokenLogic():
+            if env not in self.clients:
 
-            urls = {
-                env: (
-                    self.baseURL.replace("_", env) + self.authExtension
-                    if env != "prod"
-                    else self.baseURL.replace("_", "") + self.authExtension
+                limits = httpx.Limits(
+                    max_connections=self.maxConnections,
+                    max_keepalive_connections=self.maxKeepAliveConnections,
+                    keepalive_expiry=self.keepAliveExpiry,
                 )
-                for env in self.envs.keys()
-            }
+                self.clients[env] = httpx.Client(timeout=self.requestTimeout, limits=limits)
+
+            return self.clients[env]
+
+    #  ---------------------------------------------------------------------
+
+    def getAsyncClient(self, env):
+        """Returns the persistent async HTTP client for the given OpS env -- only to be used from coroutines running on the shared event loop"""
+
+        if env not in self.asyncClients:
+
+            limits = httpx.Limits(
+                max_connections=self.maxConnections,
+                max_keepalive_connections=self.maxKeepAliveConnections,
+                keepalive_expiry=self.keepAliveExpiry,
+            )
+            self.asyncClients[env] = httpx.AsyncClient(timeout=self.requestTimeout, limits=limits)
+
+        return self.asyncClients[env]
+
+    #  ---------------------------------------------------------------------
+
+    def closeClients(self):
+        """Closes the pooled sync and async HTTP clients for all OpS envs and releases their connections"""
+
+        with self.clientLock:
+
+            for client in self.clients.values():
+                client.close()
+
+            self.clients = {}
+
+        for client in self.asyncClients.values():
+            self.runAsync(client.aclose())
+
+        self.asyncClients = {}
+
+    #  ---------------------------------------------------------------------
+
+    def isUnauthorized(self, reply):
+        """Checks whether a reply was rejected because the session token has expired or been revoked"""
+
+        return not isinstance(reply, Exception) and reply.status_code == 401
+
+    #  ---------------------------------------------------------------------
+
+    def reauthHeaders(self, env, headers):
+        """Returns a copy of the given headers carrying a fresh token for the env, logging in again only if no other request already has"""
+
+        headers = dict(headers)
+        headers["X-OS-API-TOKEN"] = self.authTokens.refresh(env, headers.get("X-OS-API-TOKEN"))
+
+        return headers
+
+    #  ---------------------------------------------------------------------
+
+    async def authTokenAsync(self, env):
+        """Async counterpart to authTokens[env] -- any login happens on a worker thread, so it doesn't stall the shared event loop"""
+
+        return await asyncio.to_thread(self.authTokens.__getitem__, env)
+
+    #  ---------------------------------------------------------------------
+
+    def sendRequest(self, env, method, url, **kwargs):
+        """Sends a request with the pooled client for the given env, within its rate limits, retrying deadlocks, 502/503/504s, and timeouts with jittered backoff (see RetryPolicy.isRetryable for which errors are retried for POSTs)"""
+
+        client = self.getClient(env)
+        attempt = 0
+        reauthed = False
+
+        #  a write to a URL makes any shared or cached GET reply for it stale -- only URLs which can be cached are invalidated on disk,
+        #  so writes such as AQL queries don't each cost a disk write
+        if method != "GET":
+            self.coalescer.invalidate(env, url)
+
+            if self.responseCache.ttlFor(url) is not None:
+                self.responseCache.invalidate(env, url)
+
+        while True:
+
+            time.sleep(self.rateLimiter.reserve(env, url))
+
+            try:
+                reply = client.request(method, url, **kwargs)
+
+            except httpx.TransportError as error:
+                reply = error
+
+            if not reauthed and self.isUnauthorized(reply):
+                kwargs["headers"] = self.reauthHeaders(env, kwargs.get("headers", {}))
+                reauthed = True
+
+            elif self.retryPolicy.shouldRetry(reply, attempt, method):
+                time.sleep(self.retryPolicy.delay(attempt))
+                attempt += 1
+
+            else:
+                break
+
+            rewindFiles(kwargs.get("files"))
+
+        if isinstance(reply, Exception):
+            raise reply
+
+        return reply
+
+    #  ---------------------------------------------------------------------
+
+    async def sendRequestAsync(self, env, method, url, **kwargs):
+        """Async counterpart to sendRequest, using the env's persistent async client -- retried overloads are also reported to the concurrency controller, and re-auth logins run on a worker thread"""
+
+        client = self.getAsyncClient(env)
+        attempt = 0
+        reauthed = False
+
+        while True:
+
+            await asyncio.sleep(self.rateLimiter.reserve(env, url))
+
+            try:
+                reply = await client.request(method, url, **kwargs)
+
+            except httpx.TransportError as error:
+                reply = error
+
+            if not reauthed and self.isUnauthorized(reply):
+                kwargs["headers"] = await asyncio.to_thread(self.reauthHeaders, env, kwargs.get("headers", {}))
+                reauthed = True
+
+            elif self.retryPolicy.shouldRetry(reply, attempt, method):
+                self.concurrency.noteOverload()
+                await asyncio.sleep(self.retryPolicy.delay(attempt))
+                attempt += 1
+
+            else:
+                break
+
+        if isinstance(reply, Exception):
+            raise reply
+
+        return reply
+
+    #  ---------------------------------------------------------------------
+
+    def cachedGet(self, env, url, params=None, headers=None, refresh=False):
+        """Makes a Get request, answering it from the on-disk response cache where the endpoint allows, and storing successful replies"""
 
-            async with httpx.AsyncClient() as client:
+        if self.responseCache.ttlFor(url) is None:
+            return self.sendRequest(env, "GET", url, params=params, headers=headers)
 
-                tasks = [client.post(url, json=self.envs[env]) for env, url in urls.items()]
-                replies = await asyncio.gather(*tasks)
-                authTokens = {env: reply.json()["token"] for env, reply in zip(self.envs.keys(), replies)}
-                return authTokens
+        cached, isFresh = (None, False) if refresh else self.responseCache.get(env, url, params)
 
-        return asyncio.run(tokenLogic())
+        if isFresh:
+            return cached
+
+        headers = dict(headers or {})
+
+        #  an expired reply can still be reused if the server confirms it hasn't changed
+        if cached is not None and "etag" in cached.headers:
+            headers["If-None-Match"] = cached.headers["etag"]
+
+        if cached is not None and "last-modified" in cached.headers:
+            headers["If-Modified-Since"] = cached.headers["last-modified"]
+
+        reply = self.sendRequest(env, "GET", url, params=params, headers=headers)
+
+        if reply.status_code == 304 and cached is not None:
+            self.responseCache.renew(env, url, params)
+            return cached
+
+        if not reply.is_error and reply.text:
+            self.responseCache.put(env, url, params, reply)
+
+        return reply
+
+    #  ---------------------------------------------------------------------
+
+    def invalidateCache(self, env=None, extension=None):
+        """Removes cached replies for the given env and/or extension (and anything under it), or everything if neither is given"""
+
+        for cachedEnv in [env] if env else self.envs.keys():
+
+            base = self.baseURL.replace("_", "") if cachedEnv == "prod" else self.baseURL.replace("_", cachedEnv)
+            url = f"{base}{extension}" if extension else None
+
+            self.responseCache.invalidate(cachedEnv, url)
+            self.coalescer.invalidate(cachedEnv, url)
 
     #  ---------------------------------------------------------------------
 
-    def genericGetRequest(self, env, extension, params=None):
-        """Makes a Get request and returns the response JSON or resulting error message"""
+    def genericGetRequest(self, env, extension, params=None, refresh=False):
+        """Makes a Get request and returns the response JSON or resulting error message -- replies may be shared or cached unless refresh is True"""
 
         token = self.authTokens[env]
         headers = {"X-OS-API-TOKEN": token}
         base = self.baseURL.replace("_", "") if env == "prod" else self.baseURL.replace("_", env)
         url = f"{base}{extension}"
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-
-            if params:
-                reply = client.get(url, params=params)
+        if refresh:
+            self.coalescer.invalidate(env, url)
 
-            else:
-                reply = client.get(url)
+        reply = self.coalescer.fetch(
+            env, url, params, (lambda: self.cachedGet(env, url, params=params, headers=headers, refresh=refresh))
+        )
 
         reply = [reply.json()[0]["code"], reply.json()[0]["message"]] if reply.is_error else reply.json()
 
@@ -108,8 +341,12 @@ class Integration(Settings):
 
         url = f"{base}{extension}"
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-            reply = client.get(url, params=params)
+        reply = self.coalescer.fetch(
+            self.currentEnv,
+            url,
+            params,
+            (lambda: self.cachedGet(self.currentEnv, url, params=params, headers=headers)),
+        )
 
         if reply.text:
             reply = [reply.json()[0]["code"], reply.json()[0]["message"]] if reply.is_error else reply.json()
@@ -121,85 +358,158 @@ class Integration(Settings):
         return reply
 
     #  ---------------------------------------------------------------------
-    #  TODO: consider refactor of the below -- using iteritems is bad form
-    def buildExtensionDetail(self, formExten, data):
-        """Builds up the data associated with the "Additional Fields" form of the current record"""
+
+    def compileExtensionPlan(self, formExten, columns):
+        """Works out which attribute of the "Additional Fields" form each column of the data feeds, once per env, form, and set of
+        columns, so that buildExtensionDetail only needs dict operations for each record"""
+
+        planKey = (self.currentEnv, formExten["formId"], formExten["formName"], tuple(columns))
+
+        if planKey in self.extensionPlans:
+            return self.extensionPlans[planKey]
 
         formId = formExten["formId"]
         formName = formExten["formName"]
         formDF = self.setFormDF()
 
-        #  if there are none vals mixed in, we account for their under the hood float type, which forces ints to be represented as floats in the DF too
-        formFilt = (formDF[f"{self.currentEnv}ShortName"] == formName) & (
-            formDF[self.currentEnv].astype(int, errors="ignore") == formId
-        )
+        #  form IDs are written as (nullable) integers (see writeTable), so they compare with formId as read -- forms missing from the env
+        #  are blank, which never match
+        formFilt = (formDF[f"{self.currentEnv}ShortName"] == formName) & (formDF[self.currentEnv] == formId).fillna(False)
         formName = formDF.loc[formFilt, "formName"].item()
 
-        dropList = [val for val in data.index.to_list() if formName not in val]
-        cleanedData = data.drop(labels=dropList).copy()
-        cleanedData = cleanedData.dropna()
-
         #  set the field DF and then establish filters
         fieldDF = self.setFieldDF()
         fieldFilt = (fieldDF["formName"] == formName) & (fieldDF[self.currentEnv] != pd.NA)
         fieldDF = fieldDF.loc[fieldFilt, ["fieldName", self.currentEnv]]
 
-        attrsDict = {}
+        fieldKeys = {}
+
+        for fieldName, keyVal in zip(fieldDF["fieldName"], fieldDF[self.currentEnv]):
+            fieldKeys.setdefault(fieldName, []).append(keyVal)
+
+        #  a field which doesn't match exactly one attribute only raises an error once a record has a value for it, as it always has
+        def keyFor(fieldName):
+
+            keyVals = fieldKeys.get(fieldName, [])
 
-        for ind, data in cleanedData.iteritems():
+            if len(keyVals) != 1:
+                return ValueError(f"Expected one attribute for field {fieldName} of form {formName}, found {keyVals}")
+
+            return fieldKeys[fieldName][0]
+
+        plan = []
+
+        for ind in [col for col in columns if formName in col]:
 
             splitInd = ind.split("#")
 
-            # for general fields
-            if len(splitInd) < 4 and not splitInd[-1].isdigit():
+            if len(splitInd) < 2:
+                plan.append((ind, "field", [IndexError(f"Column {ind} is missing a field name")]))
 
-                filt = fieldDF["fieldName"] == ind.split("#")[1]
-                keyVal = fieldDF.loc[filt, self.currentEnv].item()
-                attrsDict[keyVal] = data
+            # for general fields
+            elif len(splitInd) < 4 and not splitInd[-1].isdigit():
+                plan.append((ind, "field", [keyFor(splitInd[1])]))
 
             # for multi-select dropdowns
             elif len(splitInd) == 3 and splitInd[-1].isdigit():
+                plan.append((ind, "multiSelect", [keyFor(splitInd[1])]))
 
-                filt = fieldDF["fieldName"] == ind.split("#")[1]
-                keyVal = fieldDF.loc[filt, self.currentEnv].item()
+            # for subform fields
+            elif len(splitInd) == 4:
+                plan.append((ind, "subForm", [keyFor(splitInd[1]), splitInd[2], keyFor(splitInd[3])]))
+
+        self.extensionPlans[planKey] = plan
+
+        return plan
+
+    #  ---------------------------------------------------------------------
 
-                if attrsDict.get(keyVal):
-                    attrsDict[keyVal].append(data)
+    def buildExtensionDetail(self, formExten, data):
+        """Builds up the data associated with the "Additional Fields" form of the current record"""
+
+        attrsDict = self.extensionAttrs(self.compileExtensionPlan(formExten, data.index), data)
+
+        if attrsDict:
+            extensionDetail = Extension(attrsMap=attrsDict)
+            return extensionDetail
+
+        else:
+            extensionDetail = Extension()
+            return extensionDetail
+
+    #  ---------------------------------------------------------------------
+
+    def extensionAttrs(self, plan, data):
+        """Builds the attrsMap of the "Additional Fields" form for a single record (a Series or a dict), given the plan from
+        compileExtensionPlan"""
+
+        attrsDict = {}
+
+        for ind, kind, keys in plan:
+
+            val = data[ind]
+
+            if pd.isna(val):
+                continue
+
+            for key in keys:
+                if isinstance(key, Exception):
+                    raise key
+
+            if kind == "field":
+                attrsDict[keys[0]] = val
+
+            elif kind == "multiSelect":
+
+                if attrsDict.get(keys[0]):
+                    attrsDict[keys[0]].append(val)
                 else:
-                    attrsDict[keyVal] = [data]
+                    attrsDict[keys[0]] = [val]
 
-            # for subform fields
-            elif len(ind.split("#")) == 4:
+            else:
 
-                filt = fieldDF["fieldName"] == ind.split("#")[1]
-                parentVal = fieldDF.loc[filt, self.currentEnv].item()
+                parentVal, instanceKey, keyVal = keys
 
                 if attrsDict.get(parentVal) is None:
                     attrsDict[parentVal] = {}
 
-                filt = fieldDF["fieldName"] == ind.split("#")[3]
-                keyVal = fieldDF.loc[filt, self.currentEnv].item()
-
-                instanceKey = ind.split("#")[2]
-
                 if attrsDict[parentVal].get(instanceKey) is None:
-                    attrsDict[parentVal][instanceKey] = {keyVal: data}
+                    attrsDict[parentVal][instanceKey] = {keyVal: val}
 
                 elif attrsDict[parentVal][instanceKey].get(keyVal) is None:
-                    attrsDict[parentVal][instanceKey][keyVal] = data
+                    attrsDict[parentVal][instanceKey][keyVal] = val
 
         for key, val in attrsDict.items():
 
             if isinstance(val, dict):
                 attrsDict[key] = [subFields for subFields in attrsDict[key].values()]
 
-        if attrsDict:
-            extensionDetail = Extension(attrsMap=attrsDict)
-            return extensionDetail
+        return attrsDict
 
-        else:
-            extensionDetail = Extension()
-            return extensionDetail
+    #  ---------------------------------------------------------------------
+
+    def planExtensions(self, df):
+        """Returns the extension plan of each CP short title in df (None for those without an "Additional Fields" form), so the
+        batch object builders look them up once per file rather than once per record"""
+
+        return {
+            shortTitle: (
+                self.compileExtensionPlan(self.formExtension[shortTitle], df.columns)
+                if self.formExtension[shortTitle]
+                else None
+            )
+            for shortTitle in df["CP Short Title"].dropna().unique()
+        }
+
+    #  ---------------------------------------------------------------------
+
+    def extensionObj(self, plan, data):
+        """Builds the Extension object for the "Additional Fields" part of a record, given the plan from compileExtensionPlan (or
+        None if there is no such form)"""
+
+        attrsDict = self.extensionAttrs(plan, data) if plan else {}
+
+        return Extension(attrsMap=attrsDict) if attrsDict else Extension()
 
     #  ---------------------------------------------------------------------
 
@@ -224,14 +534,14 @@ class Integration(Settings):
                     dataDict[key] = val
 
             dropdownDF = pd.DataFrame.from_dict(data=dataDict, dtype=str)
-            dropdownDF.to_csv(self.dropdownOutpath.replace("_", f"{env}_all_dropdown_values"), index=False)
+            self.writeTable(dropdownDF, self.dropdownOutpath.replace("_", f"{env}_all_dropdown_values"))
 
     #  ---------------------------------------------------------------------
 
     def getDropdownsAsList(self, env):
         """Gets a list of dropdowns available in the given OpS env"""
 
-        initialDict = self.genericGetRequest(env, self.dropdownExtension)
+        initialDict = self.genericGetRequest(env, self.dropdownExtension, refresh=True)
         ddList = [dropdown["attribute"] for dropdown in initialDict if dropdown["pvCount"] is not None]
         countList = [dropdown["pvCount"] for dropdown in initialDict if dropdown["pvCount"] is not None]
         countList.sort()
@@ -247,7 +557,7 @@ class Integration(Settings):
         self.pvExtensionDetails["params"]["attribute"] = dropdown
 
         initialDict = self.genericGetRequest(
-            env, self.pvExtensionDetails["pvExtension"], self.pvExtensionDetails["params"]
+            env, self.pvExtensionDetails["pvExtension"], self.pvExtensionDetails["params"], refresh=True
         )
 
         valList = [[val["value"] for val in initialDict], [val["id"] for val in initialDict]]
@@ -255,18 +565,77 @@ class Integration(Settings):
 
     #  ---------------------------------------------------------------------
 
-    def setCPDF(self, refresh=False):
-        """Creates a DF of all CPs across OpS envs specified in Settings"""
+    def readTable(self, path, dtype=None):
+        """Reads one of the local resource tables (CPs, forms, fields, or dropdowns) from its parquet copy if Settings.tableFormat is
+        "parquet" and the copy is at least as new as the CSV, and otherwise from the CSV"""
+
+        parquetPath = f"{os.path.splitext(path)[0]}.parquet"
+
+        if (
+            self.tableFormat == "parquet"
+            and pyarrow is not None
+            and os.path.exists(parquetPath)
+            and os.path.getmtime(parquetPath) >= os.path.getmtime(path)
+        ):
+            df = pd.read_parquet(parquetPath, memory_map=True)
+
+            #  gives the same as read_csv(dtype=str), where everything but blanks is a string
+            if dtype is str:
+                df = df.astype(object).apply((lambda col: col.map(str, na_action="ignore")))
+
+            return df
+
+        return pd.read_csv(path, dtype=dtype)
+
+    #  ---------------------------------------------------------------------
+
+    def writeTable(self, df, path, idCols=None):
+        """Writes one of the local resource tables to its CSV, and to its parquet copy if Settings.tableFormat is "parquet"; idCols are
+        stored as (nullable) integers, rather than as floats whenever they have blanks"""
+
+        idCols = [col for col in (idCols or []) if col in df.columns]
+
+        if idCols:
+            df = df.copy()
+            df[idCols] = df[idCols].apply((lambda col: pd.to_numeric(col).astype("Int64")))
+
+        df.to_csv(path, index=False)
+
+        if self.tableFormat == "parquet" and pyarrow is not None:
+
+            parquetPath = f"{os.path.splitext(path)[0]}.parquet"
+
+            #  columns holding a mix of types can't be stored as parquet, in which case the CSV is read until they can be
+            try:
+                df.to_parquet(parquetPath, index=False)
+
+            except (ValueError, TypeError):
+                if os.path.exists(parquetPath):
+                    os.remove(parquetPath)
+
+    #  ---------------------------------------------------------------------
+
+    def formIDCols(self):
+        """Returns the columns of the form table which hold form IDs and modification times, for each env"""
+
+        return [col for env in self.envs.keys() for col in [env, f"{env}UpdateRecord"]]
+
+    #  ---------------------------------------------------------------------
+
+    def setCPDF(self, refresh=False, copy=False):
+        """Creates a DF of all CPs across OpS envs specified in Settings; copy=True returns a copy safe to modify"""
 
         # NOTE: no need to check if cpOutPath exists already, as this is covered during instantiation of the Settings object (settings.buildEnv)
 
         if refresh:
             self.cpDF = self.syncWorkflowList(wantDF=True)
+            self.registryLookups.pop("cp", None)
 
         elif not hasattr(self, "cpDF"):
-            self.cpDF = pd.read_csv(self.cpOutPath, dtype=str)
+            self.cpDF = self.readTable(self.cpOutPath, dtype=str)
+            self.registryLookups.pop("cp", None)
 
-        return self.cpDF.copy()
+        return self.cpDF.copy() if copy else self.cpDF
 
     #  ---------------------------------------------------------------------
 
@@ -284,13 +653,13 @@ class Integration(Settings):
     def syncWorkflowList(self, wantDF=False):
         """Generates a dataframe of all CPs and their internal reference codes"""
 
-        cpDF = pd.read_csv(self.cpOutPath)
+        cpDF = self.readTable(self.cpOutPath)
 
         for env in self.authTokens.keys():
 
             for reqVals in self.workflowListDetails:
 
-                initialDict = self.genericGetRequest(env, reqVals["listExtension"], reqVals["params"])
+                initialDict = self.genericGetRequest(env, reqVals["listExtension"], reqVals["params"], refresh=True)
                 shortTitleKey = reqVals["shortTitleKey"]
 
                 for cp in initialDict:
@@ -315,7 +684,7 @@ class Integration(Settings):
                         }
                         cpDF = cpDF.append(data, ignore_index=True, sort=False)
 
-        cpDF.to_csv(self.cpOutPath, index=False)
+        self.writeTable(cpDF, self.cpOutPath, idCols=list(self.envs.keys()))
 
         if wantDF:
             return cpDF
@@ -388,13 +757,11 @@ class Integration(Settings):
         """Asynchronously fetches workflow JSON for the CPs associated with a given env in the cpDF"""
 
         async def getWorkflowsLogic(env, data):
-            token = self.authTokens[env]
+            token = await self.authTokenAsync(env)
             headers = {"X-OS-API-TOKEN": token}
 
-            async with httpx.AsyncClient(headers=headers, timeout=20) as client:
-
-                tasks = [client.get(data.loc[ind, "Url"]) for ind in data.index]
-                replies = await asyncio.gather(*tasks)
+            tasks = [self.sendRequestAsync(env, "GET", data.loc[ind, "Url"], headers=headers) for ind in data.index]
+            replies = await asyncio.gather(*tasks)
 
             replies = [
                 (
@@ -411,7 +778,7 @@ class Integration(Settings):
 
             return data
 
-        return asyncio.run(getWorkflowsLogic(env, data))
+        return self.runAsync(getWorkflowsLogic(env, data))
 
     #  ---------------------------------------------------------------------
 
@@ -428,30 +795,32 @@ class Integration(Settings):
 
     #  ---------------------------------------------------------------------
 
-    def setFormDF(self, refresh=False):
-        """Creates a DF of all forms across OpS envs specified in Settings"""
+    def setFormDF(self, refresh=False, copy=False):
+        """Creates a DF of all forms across OpS envs specified in Settings; copy=True returns a copy safe to modify"""
 
         # NOTE: no need to check if formOutPath exists already, as this is covered during instantiation of the Settings object (settings.buildEnv)
 
         if refresh:
             self.formDF = self.syncFormList(wantDF=True)
+            self.registryLookups.pop("form", None)
 
         elif not hasattr(self, "formDF"):
-            self.formDF = pd.read_csv(self.formOutPath)
+            self.formDF = self.readTable(self.formOutPath)
+            self.registryLookups.pop("form", None)
 
-        return self.formDF.copy()
+        return self.formDF.copy() if copy else self.formDF
 
     #  ---------------------------------------------------------------------
 
     def syncFormList(self, wantDF=False):
         """Generates a dataframe of all forms, their internal reference codes, and when they were last modified/updated"""
 
-        formDF = pd.read_csv(self.formOutPath)
+        formDF = self.readTable(self.formOutPath)
 
         for env in self.authTokens.keys():
 
             self.currentEnv = env
-            initialDict = self.genericGetRequest(env, self.formListExtension)
+            initialDict = self.genericGetRequest(env, self.formListExtension, refresh=True)
 
             for form in initialDict:
 
@@ -478,34 +847,84 @@ class Integration(Settings):
                     }
                     formDF = formDF.append(data, ignore_index=True, sort=False)
 
-        formDF.to_csv(self.formOutPath, index=False)
+        self.writeTable(formDF, self.formOutPath, idCols=self.formIDCols())
 
         if wantDF:
             return formDF
 
     #  ---------------------------------------------------------------------
 
-    def setFieldDF(self, refresh=False):
-        """Creates a DF of all fields across OpS envs specified in Settings"""
+    def setFieldDF(self, refresh=False, copy=False):
+        """Creates a DF of all fields across OpS envs specified in Settings; copy=True returns a copy safe to modify"""
 
         # NOTE: no need to check if fieldOutPath exists already, as this is covered during instantiation of the Settings object (settings.buildEnv)
 
         if refresh:
             self.fieldDF = self.syncFieldList(wantDF=True)
+            self.registryLookups.pop("field", None)
 
         elif not hasattr(self, "fieldDF"):
-            self.fieldDF = pd.read_csv(self.fieldOutPath)
+            self.fieldDF = self.readTable(self.fieldOutPath)
+            self.registryLookups.pop("field", None)
+
+        return self.fieldDF.copy() if copy else self.fieldDF
+
+    #  ---------------------------------------------------------------------
+
+    def getCPLookup(self):
+        """Returns a read-only mapping of CP short title to that CP's row of the CP DF, as a dict"""
+
+        if "cp" not in self.registryLookups:
+            cpDF = self.setCPDF()
+            self.registryLookups["cp"] = MappingProxyType(
+                {row["cpShortTitle"]: MappingProxyType(row) for row in cpDF.to_dict("records")}
+            )
 
-        return self.fieldDF.copy()
+        return self.registryLookups["cp"]
+
+    #  ---------------------------------------------------------------------
+
+    def getFormLookup(self):
+        """Returns a read-only mapping of form caption to that form's row of the form DF, as a dict"""
+
+        if "form" not in self.registryLookups:
+            formDF = self.setFormDF()
+            self.registryLookups["form"] = MappingProxyType(
+                {row["formName"]: MappingProxyType(row) for row in formDF.to_dict("records")}
+            )
+
+        return self.registryLookups["form"]
+
+    #  ---------------------------------------------------------------------
+
+    def getFieldLookup(self):
+        """Returns a read-only mapping of form caption to a mapping of field caption to the rows of the field DF for that
+        field, as dicts (a tuple, since subform fields can share captions with fields elsewhere in the form)"""
+
+        if "field" not in self.registryLookups:
+
+            fields = {}
+
+            for row in self.setFieldDF().to_dict("records"):
+                fields.setdefault(row["formName"], {}).setdefault(row["fieldName"], []).append(MappingProxyType(row))
+
+            self.registryLookups["field"] = MappingProxyType(
+                {
+                    formName: MappingProxyType({fieldName: tuple(rows) for fieldName, rows in formFields.items()})
+                    for formName, formFields in fields.items()
+                }
+            )
+
+        return self.registryLookups["field"]
 
     #  ---------------------------------------------------------------------
 
     def syncFieldList(self, wantDF=False):
         """Generates a dataframe of all fields and subfields, as well as their internal reference codes, associated with the forms in the dataframe generated by syncFormList"""
 
-        formDF = self.setFormDF()
+        formDF = self.setFormDF(copy=True)
 
-        universalDF = pd.read_csv(self.fieldOutPath)
+        universalDF = self.readTable(self.fieldOutPath)
 
         for env in self.authTokens.keys():
 
@@ -518,7 +937,7 @@ class Integration(Settings):
                 if pd.notna(val):
 
                     extension = f"{self.formListExtension}/{int(val)}/definition"
-                    fieldList = self.genericGetRequest(env, extension)
+                    fieldList = self.genericGetRequest(env, extension, refresh=True)
 
                     if isinstance(fieldList, list) or fieldList is None:
                         filt = (formDF["formName"] == formName) & (formDF[env] == val)
@@ -584,7 +1003,7 @@ class Integration(Settings):
                                         }
                                         universalDF = universalDF.append(data, ignore_index=True, sort=False)
 
-        universalDF.to_csv(self.fieldOutPath, index=False)
+        self.writeTable(universalDF, self.fieldOutPath)
 
         if wantDF:
             return universalDF
@@ -610,7 +1029,7 @@ class Integration(Settings):
         #  In the future, syncWorkflowList may be updated to track the last time a given workflow were synced down by a user and this function
         #  updated to check against that date, which, if outside a specified range, would trigger this function to pull a new copy just in case
 
-        cpDF = self.setCPDF()
+        cpDF = self.setCPDF(copy=True)
 
         for env in self.authTokens.keys():
 
@@ -619,7 +1038,7 @@ class Integration(Settings):
             #  Allows sync of group and cp level workflows with the same function -- see settings for more details
             for reqVals in self.workflowListDetails:
 
-                initialDict = self.genericGetRequest(env, reqVals["listExtension"], reqVals["params"])
+                initialDict = self.genericGetRequest(env, reqVals["listExtension"], reqVals["params"], refresh=True)
                 shortTitleKey = reqVals["shortTitleKey"]
                 shortTitles = [val[shortTitleKey] for val in initialDict]
 
@@ -637,7 +1056,7 @@ class Integration(Settings):
                             if shortTitleKey != "name":
 
                                 extension = self.cpWorkflowExtension.replace("_", str(cpID))
-                                workflow = self.genericGetRequest(env, extension)
+                                workflow = self.genericGetRequest(env, extension, refresh=True)
 
                                 #  if 0, no need to keep a record
                                 if len(workflow["workflows"]) != 0:
@@ -652,7 +1071,7 @@ class Integration(Settings):
                             else:
 
                                 extension = self.groupWorkflowExtension.replace("_", str(cpID))
-                                workflow = self.genericGetRequest(env, extension)
+                                workflow = self.genericGetRequest(env, extension, refresh=True)
 
                                 with open(
                                     f"./workflows/{env}/{cp[shortTitleKey]} Group Workflows.json",
@@ -666,7 +1085,7 @@ class Integration(Settings):
 
                             cpTitle = "N/A -- Group Workflow"
                             extension = self.groupWorkflowExtension.replace("_", str(cpID))
-                            workflow = self.genericGetRequest(env, extension)
+                            workflow = self.genericGetRequest(env, extension, refresh=True)
 
                             with open(
                                 f"./workflows/{env}/{cp[shortTitleKey]} Group Workflows.json",
@@ -678,7 +1097,7 @@ class Integration(Settings):
 
                             cpTitle = cp["title"]
                             extension = self.cpWorkflowExtension.replace("_", str(cpID))
-                            workflow = self.genericGetRequest(env, extension)
+                            workflow = self.genericGetRequest(env, extension, refresh=True)
 
                             #  if 0, no need to keep a record
                             if len(workflow["workflows"]) != 0:
@@ -725,21 +1144,22 @@ class Integration(Settings):
 
         #  Removing all rows that have None vals for all Envs (i.e. don't exist anywhere)
         cpDF.dropna(how="all", subset=[env for env in self.envs.keys()], inplace=True)
-        cpDF.to_csv(self.cpOutPath, index=False)
+        self.writeTable(cpDF, self.cpOutPath, idCols=list(self.envs.keys()))
 
     #  ---------------------------------------------------------------------
 
     def updateForms(self):
         """Updates forms and fields, including removing any that are no longer in use"""
 
-        fieldDF = self.setFieldDF()
-        formDF = self.setFormDF()
+        fieldDF = self.setFieldDF(copy=True)
+        formDF = self.setFormDF(copy=True)
 
         for env in self.authTokens.keys():
 
             self.currentEnv = env
 
-            initialDict = self.genericGetRequest(env, self.formListExtension)
+            #  form list and changed definitions are always fetched fresh, since modification times are what drive the update
+            initialDict = self.genericGetRequest(env, self.formListExtension, refresh=True)
             forms = [form["caption"] for form in initialDict]
             formIDs = []
 
@@ -786,7 +1206,7 @@ class Integration(Settings):
             for formID in formIDs:
 
                 extension = f"{self.formListExtension}/{formID}/definition"
-                fieldList = self.genericGetRequest(env, extension)
+                fieldList = self.genericGetRequest(env, extension, refresh=True)
                 fieldList = fieldList["rows"]
                 #  nested list comprehension pulls rows from fieldList, then the items for that row, and unifies all into a single list
                 fieldList = [item for row in fieldList for item in row]
@@ -910,14 +1330,14 @@ class Integration(Settings):
                     fieldDF.loc[filt, env] = None
 
         fieldDF.dropna(how="all", subset=[env for env in self.envs.keys()], inplace=True)
-        fieldDF.to_csv(self.fieldOutPath, index=False)
+        self.writeTable(fieldDF, self.fieldOutPath)
 
         formDF.dropna(
             how="all",
             subset=[f"{env}UpdateRecord" for env in self.envs.keys()],
             inplace=True,
         )
-        formDF.to_csv(self.formOutPath, index=False)
+        self.writeTable(formDF, self.formOutPath, idCols=self.formIDCols())
 
     #  ---------------------------------------------------------------------
     #  NOTE Misc. helper functions start here
@@ -955,6 +1375,171 @@ class Integration(Settings):
 
     #  ---------------------------------------------------------------------
 
+    def lookUpChunks(self, df, lookUpFunc, *args, weights=None):
+        """Runs a look up function over lookUpChunkSize chunks of the data concurrently, and merges the results back in their original order
+        -- if weights (the number of values each row adds to the AQL) are given, chunks hold up to lookUpChunkSize values rather than rows"""
+
+        if weights is None:
+            chunks = self.chunkDF(df, chunkSize=self.lookUpChunkSize)
+
+        else:
+            chunks = []
+            start = 0
+            total = 0
+
+            for n, weight in enumerate(weights.reindex(df.index).fillna(0).astype(int).tolist()):
+
+                if total + weight > self.lookUpChunkSize and n > start:
+                    chunks.append(df.iloc[start:n].copy())
+                    start = n
+                    total = 0
+
+                total += weight
+
+            chunks.append(df.iloc[start:].copy())
+
+        with ThreadPoolExecutor(max_workers=self.lookUpConcurrency) as ex:
+            results = list(ex.map((lambda chunk: lookUpFunc(chunk, *args)), chunks))
+
+        return pd.concat(results)
+
+    #  ---------------------------------------------------------------------
+
+    def getIdentityIndex(self, env):
+        """Returns the identity index for the given env, opening it on first use"""
+
+        #  look ups run concurrently (see lookUpChunks), so the first look ups in an env mustn't each open a connection
+        with self.identityLock:
+
+            if env not in self.identityIndexes:
+                self.identityIndexes[env] = IdentityIndex(self.identityIndexPath.replace("_", env))
+
+            return self.identityIndexes[env]
+
+    #  ---------------------------------------------------------------------
+
+    def clearIdentityIndex(self, env=None, kind=None):
+        """Forgets the matches remembered for the given env (or all envs), optionally only those of one kind (i.e. "Specimen Label")"""
+
+        for indexEnv in [env] if env else self.envs.keys():
+            self.getIdentityIndex(indexEnv).clear(kind)
+
+    #  ---------------------------------------------------------------------
+
+    def lookUpIdentities(self, keys, buildAQL, kind=None, formatKey=(lambda key: f'"{key}"')):
+        """Returns the match query rows for the given keys, from the identity index where known and via AQL for the rest, which are then indexed
+        -- formatKey writes each key as it should appear in the AQL (quoted, by default)"""
+
+        keyCol = keys.name
+        kind = kind or keyCol
+        index = self.getIdentityIndex(self.currentEnv)
+
+        uniqueKeys = keys.dropna().unique().tolist()
+        known = {} if self.verifyIdentities else index.get(kind, uniqueKeys)
+        missing = [key for key in uniqueKeys if key not in known]
+
+        details = pd.DataFrame([{keyCol: key, **row} for key, rows in known.items() for row in rows], dtype=str)
+
+        if missing:
+
+            token = self.authTokens[self.currentEnv]
+            headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
+            url = (
+                self.baseURL.replace("_", "")
+                if self.currentEnv == "prod"
+                else self.baseURL.replace("_", self.currentEnv)
+            ) + self.queryExtension
+
+            matchVals = ", ".join([formatKey(key) for key in missing])
+
+            reply = self.sendRequest(
+                self.currentEnv,
+                "POST",
+                url,
+                headers=headers,
+                content=encodeBody({"cpId": -1, "aql": buildAQL(matchVals)}),
+            )
+
+            fetched = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
+
+            #  keys OpS doesn't know yet aren't indexed, since they may well be created by this very load
+            index.replace(
+                kind,
+                {key: group.drop(columns=[keyCol]).to_dict("records") for key, group in fetched.groupby(keyCol)},
+            )
+
+            details = pd.concat([details, fetched]) if not details.empty else fetched
+
+        #  with no rows to go on, the frame still gets the columns the match query returns, so callers can use them as usual
+        if keyCol not in details.columns:
+            details = pd.DataFrame(columns=re.findall(r' as "([^"]*)"', buildAQL("")), dtype=str)
+
+            if keyCol not in details.columns:
+                details[keyCol] = None
+
+        return details
+
+    #  ---------------------------------------------------------------------
+
+    def indexCreatedRecords(self, replies, recordType):
+        """Adds the participants, visits, or specimens created by a chunk of requests to the identity index, so later loads find them locally"""
+
+        index = self.getIdentityIndex(self.currentEnv)
+
+        for reply in replies:
+
+            if isinstance(reply, Exception) or reply.is_error:
+                continue
+
+            records = reply.json() if isinstance(reply.json(), list) else [reply.json()]
+
+            for record in [record for record in records if isinstance(record, dict) and "id" in record]:
+
+                cpShortTitle = record.get("cpShortTitle")
+
+                if recordType == "participant":
+
+                    participant = record.get("participant", {})
+                    row = {
+                        "Participant ID": str(participant.get("id")),
+                        "CPR ID": str(record["id"]),
+                        "Participant Original CP": cpShortTitle,
+                    }
+                    index.add("PPID", record.get("ppid"), row)
+
+                    if participant.get("empi"):
+                        index.add("eMPI", participant["empi"], row)
+
+                    for pmi in participant.get("pmis") or []:
+                        index.add(f"MRN#{pmi.get('siteName')}", pmi.get("mrn"), row)
+
+                elif recordType == "visit":
+                    row = {"Visit ID": str(record["id"]), "Visit Original CP": cpShortTitle}
+                    index.add("Visit Name", record.get("name"), row)
+
+                elif recordType == "specimen":
+                    row = {"Specimen ID": str(record["id"]), "Specimen Original CP": cpShortTitle}
+                    index.add("Specimen Label", record.get("label"), row)
+                    index.add("Parent Specimen Label", record.get("label"), {"Parent ID": str(record["id"])})
+
+    #  ---------------------------------------------------------------------
+
+    def pushRecords(self, df, pushFunc):
+        """Passes df to pushFunc in chunks sized by the concurrency controller, so each chunk is as large as the server is currently handling well"""
+
+        results = []
+        start = 0
+
+        while start < len(df.index):
+
+            chunk = df.iloc[start : start + self.concurrency.limit].copy()
+            results.append(pushFunc(chunk))
+            start += len(chunk.index)
+
+        return results
+
+    #  ---------------------------------------------------------------------
+
     def runQuery(self, env, cpID, AQL, wantWideRows=False, asDF=False):
         """Runs a query via OpS and returns the response JSON, otherwise returns error message from the server. Use -1 for cpID if querying across multiple CPs specified in AQL"""
 
@@ -975,25 +1560,88 @@ class Integration(Settings):
             # "runType": "Data",
         }
 
-        # Rather than one row per case of a value, add as many columns as necessary to capture all cases (i.e. instead of one row per MRN Site + MRN Value, one row with multiple columns)
-        if wantWideRows:
-            data["wideRowMode"] = "DEEP"
+        # Rather than one row per case of a value, add as many columns as necessary to capture all cases (i.e. instead of one row per MRN Site + MRN Value, one row with multiple columns)
+        if wantWideRows:
+            data["wideRowMode"] = "DEEP"
+
+        reply = self.sendRequest(env, "POST", url, content=encodeBody(data), headers=headers)
+
+        reply = ", ".join([reply.json()[0]["code"], reply.json()[0]["message"]]) if reply.is_error else reply.json()
+
+        if asDF:
+            reply = self.buildQueryDF(reply)
+
+        return reply
+
+    #  ---------------------------------------------------------------------
+
+    def buildQueryDF(self, reply):
+        """Converts the JSON returned by a query into a DataFrame, reformatting any dates"""
+
+        df = pd.DataFrame(reply["rows"], columns=reply["columnLabels"])
+
+        dateCols = [col for col in df.columns if "date" in col.lower()]
+        for col in dateCols:
+            df[col] = df[col].str.replace("-", "/")
+
+        return df
+
+    #  ---------------------------------------------------------------------
+
+    def runQueryPaged(self, env, cpID, AQL, wantWideRows=False, pageSize=None, concurrentPages=None):
+        """Runs a query via OpS a page at a time and yields each page of results as a DataFrame, fetching a few pages concurrently"""
+
+        pageSize = pageSize or self.queryPageSize
+        concurrentPages = concurrentPages or self.queryPageConcurrency
+
+        token = self.authTokens[env]
+        headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
+        base = self.baseURL.replace("_", "") if env == "prod" else self.baseURL.replace("_", env)
+        url = f"{base}{self.queryExtension}"
+
+        def pageData(startAt):
+
+            data = {"cpId": cpID, "aql": AQL, "startAt": startAt, "maxResults": pageSize}
+
+            if wantWideRows:
+                data["wideRowMode"] = "DEEP"
+
+            return encodeBody(data)
+
+        async def pageLogic(startAts):
+
+            tasks = [
+                self.sendRequestAsync(
+                    env, "POST", url, content=pageData(startAt), headers=headers, timeout=self.queryTimeout
+                )
+                for startAt in startAts
+            ]
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-            reply = client.post(url, data=jp.encode(data, unpicklable=False))
+            return await asyncio.gather(*tasks)
 
-        reply = ", ".join([reply.json()[0]["code"], reply.json()[0]["message"]]) if reply.is_error else reply.json()
+        startAt = 0
 
-        if asDF:
-            columns = reply["columnLabels"]
-            data = reply["rows"]
-            reply = pd.DataFrame(data, columns=columns)
+        while True:
 
-            dateCols = [col for col in reply.columns if "date" in col.lower()]
-            for col in dateCols:
-                reply[col] = reply[col].str.replace("-", "/")
+            pageStarts = [startAt + (page * pageSize) for page in range(concurrentPages)]
+            replies = self.runAsync(pageLogic(pageStarts))
 
-        return reply
+            for pageStart, reply in zip(pageStarts, replies):
+
+                if reply.is_error:
+                    raise RuntimeError(f"Query failed: {reply.json()[0]['code']}, {reply.json()[0]['message']}")
+
+                page = self.buildQueryDF(reply.json())
+
+                #  the first page is yielded even if empty, so there are always columns to go on
+                if not page.empty or pageStart == 0:
+                    yield page
+
+                #  a short page means there are no more results, so the rest of this batch is empty too
+                if len(page) < pageSize:
+                    return
+
+            startAt += concurrentPages * pageSize
 
     #  ---------------------------------------------------------------------
     #  NOTE Generic/GUI exports and related functions start here
@@ -1072,21 +1720,23 @@ class Integration(Settings):
         """Triggers the export of data from a particular CP, given the requests generated by generateRequest"""
 
         async def exportLogic(requests, env):
-            token = self.authTokens[env]
+            token = await self.authTokenAsync(env)
             headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
             base = self.baseURL.replace("_", "") if env == "prod" else self.baseURL.replace("_", env)
             url = f"{base}{self.exportExtension}"
 
-            async with httpx.AsyncClient(headers=headers, timeout=200) as client:
-
-                tasks = [
-                    client.post(
-                        url,
-                        data=jp.encode(request, unpicklable=False),
-                    )
-                    for request in requests
-                ]
-                replies = await asyncio.gather(*tasks)
+            tasks = [
+                self.sendRequestAsync(
+                    env,
+                    "POST",
+                    url,
+                    content=encodeBody(request),
+                    headers=headers,
+                    timeout=200,
+                )
+                for request in requests
+            ]
+            replies = await asyncio.gather(*tasks)
 
             # this is in a specific order, so be careful when altering -- you might end up with mislabeled exports
             genericExports = ["Specimens", "Visits", "Participants"]
@@ -1104,7 +1754,7 @@ class Integration(Settings):
 
             return results
 
-        return asyncio.run(exportLogic(requests, env))
+        return self.runAsync(exportLogic(requests, env))
 
     #  ---------------------------------------------------------------------
 
@@ -1112,15 +1762,16 @@ class Integration(Settings):
         """Pulls down the files generated by triggerExport and saves them"""
 
         async def downloadLogic(exportRecords, env, path):
-            token = self.authTokens[env]
+            token = await self.authTokenAsync(env)
             headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
             base = self.baseURL.replace("_", "") if env == "prod" else self.baseURL.replace("_", env)
             url = f"{base}{self.downloadExtension}"
 
-            async with httpx.AsyncClient(headers=headers, timeout=200) as client:
-
-                tasks = [client.get(url.replace("_", export[0])) for export in exportRecords]
-                replies = await asyncio.gather(*tasks)
+            tasks = [
+                self.sendRequestAsync(env, "GET", url.replace("_", export[0]), headers=headers, timeout=200)
+                for export in exportRecords
+            ]
+            replies = await asyncio.gather(*tasks)
 
             results = [
                 ([reply.json()[0]["code"], reply.json()[0]["message"]] if reply.is_error else reply.content)
@@ -1141,7 +1792,7 @@ class Integration(Settings):
                 os.remove(filePath)
                 os.rename(f"{path}/output.csv", f"{path}/{export[1]}.csv")
 
-        return asyncio.run(downloadLogic(exportRecords, env, path))
+        return self.runAsync(downloadLogic(exportRecords, env, path))
 
     #  ---------------------------------------------------------------------
 
@@ -1170,8 +1821,7 @@ class Integration(Settings):
         with open(filePath, "rb") as f:
             files = [("file", (".json", f, "application/octet-stream"))]
 
-            with httpx.Client(headers=headers, timeout=20) as client:
-                reply = client.post(url, files=files)
+            reply = self.sendRequest(env, "POST", url, files=files, headers=headers)
 
         print(reply.text)
 
@@ -1204,18 +1854,18 @@ class Integration(Settings):
         labels = data["Path. Number"].map((lambda x: f'"{x}"')).copy()
         matchVals = ", ".join(labels.to_list())
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-
-            reply = client.post(
-                url,
-                data=jp.encode(
-                    {
-                        "cpId": -1,
-                        "aql": self.visitSurgicalAccessionNumberMatchAQL.replace("_", matchVals),
-                    },
-                    unpicklable=False,
-                ),
-            )
+        reply = self.sendRequest(
+            env,
+            "POST",
+            url,
+            headers=headers,
+            content=encodeBody(
+                {
+                    "cpId": -1,
+                    "aql": self.visitSurgicalAccessionNumberMatchAQL.replace("_", matchVals),
+                }
+            ),
+        )
 
         visitDetails = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
 
@@ -1238,8 +1888,7 @@ class Integration(Settings):
         with open(file, "rb") as f:
             files = {"file": f}
 
-            with httpx.Client(headers=headers, timeout=20) as client:
-                reply = client.post(url, files=files)
+            reply = self.sendRequest(env, "POST", url, files=files, headers=headers)
 
         return reply.text
 
@@ -1264,7 +1913,7 @@ class Integration(Settings):
 
             currentDF[env] = currentDF[env].astype(str).map((lambda x: x.split(".")[0]))
             currentDF["Response"] = currentDF[env].map(
-                (lambda x: self.genericGetRequest(env, f"{self.cpWorkflowListExtension}{x}"))
+                (lambda x: self.genericGetRequest(env, f"{self.cpWorkflowListExtension}{x}", refresh=True))
             )
 
             filt = currentDF["Response"].map((lambda x: isinstance(x, dict)))
@@ -1304,13 +1953,12 @@ class Integration(Settings):
                 [{"siteName": val} for val in add if all(val != site["siteName"] for site in uploadData["cpSites"])]
             )
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-            response = client.put(url, data=jp.encode(uploadData, unpicklable=False))
+        response = self.sendRequest(env, "PUT", url, content=encodeBody(uploadData), headers=headers)
 
-            response = response.json()
+        response = response.json()
 
-            if isinstance(response, list):
-                return response
+        if isinstance(response, list):
+            return response
 
     #  ---------------------------------------------------------------------
     #  requires file name be formatted as templateType_env_importType_[misc. info] where importType is create or update
@@ -1351,13 +1999,18 @@ class Integration(Settings):
     def fileUploadPrep(self, file):
         """Prepares a file for upload via genericGUIFileUpload"""
 
-        df = pd.read_csv(file, dtype=str)
+        preppedFile = f"{self.streamDir}{os.path.basename(file)}"
 
-        dtConvertCols = [col for col in df.columns.values if "date" in col.lower() or "created" in col.lower()]
-        for col in dtConvertCols:
-            filt = df[col].notna()
-            df.loc[filt, col] = df.loc[filt, col].map(self.cleanDateForFileUpload)
-        df.to_csv(file, index=False)
+        #  read and written in batches, since nothing here depends on more than one row at a time
+        for n, df in enumerate(pd.read_csv(file, dtype=str, chunksize=self.streamChunkRows)):
+
+            dtConvertCols = [col for col in df.columns.values if "date" in col.lower() or "created" in col.lower()]
+            for col in dtConvertCols:
+                filt = df[col].notna()
+                df.loc[filt, col] = self.mapUnique(df.loc[filt, col], self.cleanDateForFileUpload)
+            df.to_csv(preppedFile, mode="w" if n == 0 else "a", header=(n == 0), index=False)
+
+        shutil.move(preppedFile, file)
 
         return file
 
@@ -1400,8 +2053,7 @@ class Integration(Settings):
         with open(file, "rb") as f:
             files = [("file", (".csv", f, "application/octet-stream"))]
 
-            with httpx.Client(headers=headers, timeout=20) as client:
-                reply = client.post(url, files=files)
+            reply = self.sendRequest(env, "POST", url, files=files, headers=headers)
 
         fileID = ", ".join([reply.json()[0]["code"], reply.json()[0]["message"]]) if reply.is_error else reply.json()
         fileID = fileID["fileId"]
@@ -1415,8 +2067,7 @@ class Integration(Settings):
         url = f"{base}{self.uploadExtension}"
         headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-            reply = client.post(url, data=jp.encode(data, unpicklable=False))
+        reply = self.sendRequest(env, "POST", url, content=encodeBody(data), headers=headers)
 
         uploadID = ", ".join([reply.json()[0]["code"], reply.json()[0]["message"]]) if reply.is_error else reply.json()
         uploadID = uploadID["id"]
@@ -1430,8 +2081,7 @@ class Integration(Settings):
             while status is None:
 
                 url = f"{base}{extension}"
-                with httpx.Client(headers=headers, timeout=20) as client:
-                    reply = client.get(url)
+                reply = self.sendRequest(env, "GET", url, headers=headers)
 
                 uploadStatus = (
                     ", ".join([reply.json()[0]["code"], reply.json()[0]["message"]])
@@ -1449,8 +2099,7 @@ class Integration(Settings):
                             extension += "/output"
 
                             url = f"{base}{extension}"
-                            with httpx.Client(headers=headers, timeout=20) as client:
-                                reply = client.get(url)
+                            reply = self.sendRequest(env, "GET", url, headers=headers)
 
                             uploadStatus = (
                                 ", ".join([reply.json()[0]["code"], reply.json()[0]["message"]])
@@ -1496,14 +2145,14 @@ class Integration(Settings):
 
         if validatedItems["universal"]:
             [
-                self.universalUpload(self.dfImport(file, env), matchPPID)
+                self.uploadFile(file, env, self.universalUpload, matchPPID)
                 for file, env in tqdm(validatedItems["universal"].items(), desc="Universal Uploads", unit=" Files")
             ]
             [shutil.move(file, self.outputDir) for file in validatedItems["universal"].keys()]
 
         if validatedItems["participants"]:
             [
-                self.participantUpload(self.dfImport(file, env), matchPPID)
+                self.uploadFile(file, env, self.participantUpload, matchPPID)
                 for file, env in tqdm(
                     validatedItems["participants"].items(), desc="Participant Uploads", unit=" Files"
                 )
@@ -1512,14 +2161,14 @@ class Integration(Settings):
 
         if validatedItems["visits"]:
             [
-                self.visitUpload(self.dfImport(file, env))
+                self.uploadFile(file, env, self.visitUpload)
                 for file, env in tqdm(validatedItems["visits"].items(), desc="Visit Uploads", unit=" Files")
             ]
             [shutil.move(file, self.outputDir) for file in validatedItems["visits"].keys()]
 
         if validatedItems["specimens"]:
             [
-                self.specimenUpload(self.dfImport(file, env))
+                self.uploadFile(file, env, self.specimenUpload)
                 for file, env in tqdm(validatedItems["specimens"].items(), desc="Specimen Uploads", unit=" Files")
             ]
             [shutil.move(file, self.outputDir) for file in validatedItems["specimens"].keys()]
@@ -1542,11 +2191,126 @@ class Integration(Settings):
 
     #  ---------------------------------------------------------------------
 
+    def mapUnique(self, series, func):
+        """Applies func once per distinct value in series and maps the results back, since date columns tend to repeat the same values"""
+
+        codes, uniques = pd.factorize(series)
+        results = pd.Series([func(val) for val in uniques], dtype=object)
+
+        return pd.Series(results.to_numpy()[codes], index=series.index)
+
+    #  ---------------------------------------------------------------------
+
+    def dateTimesToEpoch(self, series):
+        """Converts date/time strings in the local timezone to milliseconds since the epoch (as strings), trying Settings.datetimeFormat and
+        then Settings.dateFormat before inferring the format of whatever is left, and parsing each distinct value only once"""
+
+        codes, uniques = pd.factorize(series)
+        uniques = pd.Series(uniques, dtype=object)
+
+        parsed = pd.to_datetime(uniques, format=self.datetimeFormat, errors="coerce")
+        missing = parsed.isna()
+        parsed[missing] = pd.to_datetime(uniques[missing], format=self.dateFormat, errors="coerce")
+        missing = parsed.isna()
+
+        #  anything in neither format is parsed as it always was, and still raises an error if it can't be parsed at all
+        if missing.any():
+            parsed[missing] = uniques[missing].map(pd.to_datetime)
+
+        parsed = pd.to_datetime(parsed).dt.tz_localize(tz=self.timezone)
+        epoch = (parsed - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(milliseconds=1)
+
+        return pd.Series(epoch.astype(str).to_numpy()[codes], index=series.index)
+
+    #  ---------------------------------------------------------------------
+
+    def datesToISO(self, series):
+        """Reorders MM/DD/YYYY dates (ignoring any time) to YYYY-MM-DD, as OpS expects for Date Of Birth and Death Date"""
+
+        dates = series.str.split(" ", n=1).str[0].str.split("/")
+
+        if (dates.str.len() < 3).any():
+            badDates = series.loc[dates.str.len() < 3].tolist()
+            raise ValueError(f"Unable to reorder dates which aren't in MM/DD/YYYY format: {badDates}")
+
+        return dates.str[2] + "-" + dates.str[0] + "-" + dates.str[1]
+
+    #  ---------------------------------------------------------------------
+
+    def uploadFile(self, file, env, uploadFunc, *args):
+        """Imports the file and passes it to uploadFunc, or, if it is larger than Settings.streamFileSizeMB, does so for one batch of
+        Settings.streamChunkRows rows at a time, then combines the results back into the file"""
+
+        if os.path.getsize(file) <= self.streamFileSizeMB * 1024 * 1024:
+            return uploadFunc(self.dfImport(file, env), *args)
+
+        #  keyed by size and modification time, so the batches of an interrupted run are picked up again, but not those of an older file
+        fileStats = os.stat(file)
+        name = os.path.basename(file)
+        partDir = f"{self.streamDir}{name}_{fileStats.st_size}_{fileStats.st_mtime_ns}/"
+        os.makedirs(partDir, exist_ok=True)
+
+        parts = []
+
+        for n, batch in enumerate(pd.read_csv(file, dtype=str, chunksize=self.streamChunkRows)):
+
+            #  each batch goes through the usual import, journaling, and checkpointing as its own file, which is marked done by
+            #  renaming it once uploaded, so a restarted run skips the batches which already finished
+            partFile = f"{partDir}{n}_{name}"
+            doneFile = f"{partFile}.done"
+            parts.append(doneFile)
+
+            if os.path.exists(doneFile):
+                print(f"Skipping Rows {n * self.streamChunkRows + 1} to {n * self.streamChunkRows + len(batch.index)} of {name}")
+                continue
+
+            print(f"Uploading Rows {n * self.streamChunkRows + 1} to {n * self.streamChunkRows + len(batch.index)} of {name}")
+
+            if not os.path.exists(partFile):
+                batch.to_csv(partFile, index=False)
+
+            del batch
+
+            self.streamingFile = True
+
+            try:
+                uploadFunc(self.dfImport(partFile, env), *args)
+
+            finally:
+                self.streamingFile = False
+
+            os.replace(partFile, doneFile)
+
+        #  batches can end up with different columns (i.e. a status column only some of them needed), so they're aligned on the way out
+        cols = []
+
+        for partFile in parts:
+            cols.extend([col for col in pd.read_csv(partFile, dtype=str, nrows=0).columns if col not in cols])
+
+        for n, partFile in enumerate(parts):
+            results = pd.read_csv(partFile, dtype=str).reindex(columns=cols)
+            results.to_csv(f"{partDir}{name}", mode="w" if n == 0 else "a", header=(n == 0), index=False)
+
+        shutil.move(f"{partDir}{name}", file)
+
+        #  only now that every batch is back in the file are their checkpoints no longer needed
+        for partFile in parts:
+            self.checkpoints.clear(self.inputHash(pd.read_csv(partFile, dtype=str), partFile[: -len(".done")]))
+
+        shutil.rmtree(partDir)
+
+    #  ---------------------------------------------------------------------
+
     def dfImport(self, file, env):
         """Import and pre-processing/pre-validation of data which is to be uploaded/audited"""
 
         df = pd.read_csv(file, dtype=str)
         self.currentItem = file
+        self.retryPolicy.resetBudget()
+        self.extensionPlans = {}
+
+        #  earlier versions stored the hash in the file itself, which went stale as soon as the file was edited
+        df = df.drop(columns=["File Hash"], errors="ignore")
 
         dtConvertCols = [
             col
@@ -1564,34 +2328,30 @@ class Integration(Settings):
             if originalCol not in df.columns:
                 df[originalCol] = df[col]
                 filt = df["DTs Processed"].isna() & df[col].notna()
-                df.loc[filt, col] = (
-                    pd.to_datetime(df.loc[filt, col]).dt.tz_localize(tz=self.timezone).astype("Int64") // 1e6
-                )
-                df.loc[filt, col] = df.loc[filt, col].astype("Int64").astype(str)
+                df.loc[filt, col] = self.dateTimesToEpoch(df.loc[filt, col])
 
         # very important to notice that the "Of" is capitalized -- otherwise, can always check against columns which are forced into lower case or something
         if "Date Of Birth" in df.columns:
             filt = (df["Date Of Birth"].notna()) & (df["DTs Processed"].isna())
-            df.loc[filt, "Date Of Birth"] = df.loc[filt, "Date Of Birth"].map(
-                (
-                    lambda x: "-".join(
-                        [x.split(" ")[0].split("/")[2], x.split(" ")[0].split("/")[0], x.split(" ")[0].split("/")[1]]
-                    )
-                )
-            )
+            df.loc[filt, "Date Of Birth"] = self.datesToISO(df.loc[filt, "Date Of Birth"])
 
         if "Death Date" in df.columns:
             filt = (df["Death Date"].notna()) & (df["DTs Processed"].isna())
-            df.loc[filt, "Death Date"] = df.loc[filt, "Death Date"].map(
-                (
-                    lambda x: "-".join(
-                        [x.split(" ")[0].split("/")[2], x.split(" ")[0].split("/")[0], x.split(" ")[0].split("/")[1]]
-                    )
-                )
-            )
+            df.loc[filt, "Death Date"] = self.datesToISO(df.loc[filt, "Death Date"])
 
         df["DTs Processed"] = "TRUE"
 
+        #  hashed once dates are processed, since later runs read them back in that form (see checkpointRows)
+        self.currentFileHash = self.inputHash(df, file) if not df.empty else None
+        self.openRecordJournal(file, self.currentFileHash)
+
+        #  picking up where a previous run left off, if it stopped before writing its progress into the file -- the journal only holds
+        #  changes to the columns the upload writes, which the hash leaves out, so replaying them here rather than first changes nothing
+        resumed = self.recordJournal.replay(df)
+
+        if resumed:
+            print(f"Resumed {resumed} Record Changes from Journal")
+
         # standard code for the below is "##set_to_blank##" --> see here: https://openspecimen.atlassian.net/wiki/spaces/CAT/pages/71598083/Updating+value+as+blank+using+bulk+import
         filt = df.isin([self.setBlankCode]).any()
         if filt.any():
@@ -1599,13 +2359,14 @@ class Integration(Settings):
             df.loc[filt] = ""
 
         df.to_csv(file, index=False)
+        self.recordJournal.clear()
         self.recordDF = df.copy()
 
         # basically, if participant, visit, specimen, or universal upload
         if "CP Short Title" in df.columns:
 
             df["CP ID"] = None
-            cpDF = self.setCPDF()
+            cpLookup = self.getCPLookup()
 
             #  getting all unique CP short titles and their codes in order to build a dict that makes referencing them later easier
             uniqueShortTitles = df["CP Short Title"].unique()
@@ -1613,9 +2374,8 @@ class Integration(Settings):
 
             for shortTitle in uniqueShortTitles:
                 filt = df["CP Short Title"] == shortTitle
-                df.loc[filt, "CP ID"] = (
-                    cpDF.loc[(cpDF["cpShortTitle"] == shortTitle), env].astype(int, errors="ignore").item()
-                )
+                cpID = cpLookup[shortTitle][env]
+                df.loc[filt, "CP ID"] = int(cpID) if str(cpID).isdigit() else cpID
 
                 if len(uniqueShortTitles) > 1:
                     newDF = df[filt].copy()
@@ -1646,6 +2406,112 @@ class Integration(Settings):
 
     #  ---------------------------------------------------------------------
 
+    def inputHash(self, df, file):
+        """Hashes the name of the file and the data supplied in df, leaving out the columns which the upload writes back into the file
+        (see Settings.checkpointExcludedCols), so that it only changes when the data itself is edited"""
+
+        cols = sorted(
+            col
+            for col in df.columns
+            if col not in self.checkpointExcludedCols and not col.startswith("Original ")
+        )
+
+        #  values set to blank are written back as empty cells, and empty columns aren't written back at all (see compactRecord)
+        data = df[cols].astype(object)
+        data = data.where(~data.isin([self.setBlankCode]), None).dropna(axis=1, how="all")
+
+        #  the file name is included since the columns which identify records are often among those left out
+        digest = hashlib.sha256("|".join([os.path.basename(file)] + list(data.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+
+        return digest.hexdigest()
+
+    #  ---------------------------------------------------------------------
+
+    def openRecordJournal(self, file, fileHash):
+        """Opens the journal of changes to the record of the given file, closing that of the previous file -- only changes logged for
+        the same fileHash (see inputHash) are replayed, so a journal left behind by a different file of the same name is ignored"""
+
+        if self.recordJournal is not None:
+            self.recordJournal.close()
+
+        self.recordJournal = RecordJournal(self.journalPath.replace("_", os.path.basename(file)), fileHash)
+
+    #  ---------------------------------------------------------------------
+
+    def journalRecord(self, index, cols):
+        """Logs the current values of the given rows and columns of the record to its journal, rather than rewriting the record file"""
+
+        values = self.recordDF.loc[index, cols].astype(object)
+        values = values.where(values.notna(), None)
+
+        self.recordJournal.append(pd.Index(index).tolist(), list(cols), values.values.tolist())
+
+    #  ---------------------------------------------------------------------
+
+    def compactRecord(self):
+        """Writes the record out to its file in full, after which the changes logged in its journal are no longer needed"""
+
+        self.recordDF.to_csv(self.currentItem, index=False)
+        self.recordJournal.clear()
+
+    #  ---------------------------------------------------------------------
+
+    def checkpointRows(self, stage, index, status):
+        """Sets the checkpoint status ("pending" or "done") of the given rows of the current file at the given upload stage, or removes
+        their checkpoints if status is None"""
+
+        if self.resumeUploads and self.currentFileHash is not None:
+            self.checkpoints.mark(self.currentFileHash, stage, pd.Index(index).tolist(), status)
+
+    #  ---------------------------------------------------------------------
+
+    def checkpointReplies(self, stage, index, replies):
+        """Checkpoints the rows whose requests succeeded as done, and removes the checkpoints of those which failed so they are retried"""
+
+        succeeded = [not isinstance(reply, Exception) and not reply.is_error for reply in replies]
+
+        self.checkpointRows(stage, pd.Index(index)[succeeded], "done")
+        self.checkpointRows(stage, pd.Index(index)[[not success for success in succeeded]], None)
+
+    #  ---------------------------------------------------------------------
+
+    def resumeCheckpoints(self, stage, updateRecords, createRecords, keyCols):
+        """Drops the rows which already succeeded in an earlier run on the same file, and flags creates which may have succeeded without a
+        reply but can't be verified because they have none of keyCols to match them on"""
+
+        checkpoints = self.checkpoints.get(self.currentFileHash, stage) if self.resumeUploads else {}
+
+        if not checkpoints:
+            return updateRecords, createRecords
+
+        done = [row for row, status in checkpoints.items() if status == "done"]
+        pending = [row for row, status in checkpoints.items() if status == "pending"]
+
+        print(f"Resuming {stage.title()} Upload -- Skipping {len(done)} Rows Which Already Succeeded")
+
+        updateRecords = updateRecords.loc[~updateRecords.index.isin(done)]
+        createRecords = createRecords.loc[~createRecords.index.isin(done)]
+
+        # matching has already run, so a pending create with a key either wasn't made or is now an update -- retrying is safe, since OpS
+        # rejects duplicate PPIDs, visit names, and labels, but one without a key could be made twice, so it's left for the user to check
+        unverifiable = createRecords.index.isin(pending) & createRecords[keyCols].isna().all(axis=1)
+
+        if unverifiable.any():
+
+            errorCol = f"Critical Error - {stage.title()}"
+            unverifiedIndex = createRecords.index[unverifiable]
+
+            self.recordDF.loc[unverifiedIndex, errorCol] = (
+                "Create may have succeeded in an earlier run -- check OpS before re-uploading"
+            )
+            self.journalRecord(unverifiedIndex, [errorCol])
+            createRecords = createRecords.loc[~unverifiable]
+
+        return updateRecords, createRecords
+
+    #  ---------------------------------------------------------------------
+
     def universalUpload(self, dfDict, matchPPID):
         """Wrapper around the upload functions for the three main import types which compose the OpS "Master Specimen" template; Uploads data from a universal template"""
 
@@ -1672,8 +2538,7 @@ class Integration(Settings):
                 print("Populating Missing PPIDs by Participant ID")
 
                 matchDF = participantDF.loc[ppidParticipantIDFilt].copy()
-                matchParticipantDF = self.chunkDF(matchDF, chunkSize=self.lookUpChunkSize)
-                matchedDF = pd.concat([self.getPPIDByParticipantID(df, shortTitle) for df in matchParticipantDF])
+                matchedDF = self.lookUpChunks(matchDF, self.getPPIDByParticipantID, shortTitle)
 
                 participantDF.update(matchedDF)
 
@@ -1690,7 +2555,7 @@ class Integration(Settings):
             # this should avoid needing error handling for "CPR_DUP_PPID", but still need to consider "CPR_MANUAL_PPID_NOT_ALLOWED"
             # introduces a consideration regarding create/update as a subset of has PPID vs. not
 
-            participantDF = participantDF.apply(self.buildParticipantObj, axis=1)
+            participantDF["Participant Obj"] = self.buildParticipantObjs(participantDF)
 
             dropFilt = participantDF["Participant Obj"].isna()
             participantDF = participantDF.drop(index=participantDF.loc[dropFilt].index)
@@ -1708,33 +2573,18 @@ class Integration(Settings):
             )
             participantDF.loc[~updateFilt, "Participant Url"] = f"{base}{self.registerParticipantExtension}"
 
-            updateRecords = self.chunkDF(participantDF.loc[updateFilt].copy())
-
+            updateRecords = participantDF.loc[updateFilt].copy()
             createRecords = self.participantNoMatchValidation(participantDF.loc[~updateFilt].copy())
-            createRecords = self.chunkDF(createRecords)
-
-            if updateRecords and createRecords:
 
-                # with ThreadPoolExecutor(2) as ex:
-                #     updateRecords = pd.concat(ex.map(self.updateParticipants, updateRecords))
-                #     createRecords = pd.concat(ex.map(self.createParticipants, createRecords))
-
-                updateRecords = [self.updateParticipants(record) for record in updateRecords]
-                createRecords = [self.createParticipants(record) for record in createRecords]
-
-            elif updateRecords:
-
-                # with ThreadPoolExecutor(2) as ex:
-                #     participantDF = pd.concat(ex.map(self.updateParticipants, updateRecords))
-
-                updateRecords = [self.updateParticipants(record) for record in updateRecords]
-
-            else:
-
-                # with ThreadPoolExecutor(2) as ex:
-                #     participantDF = pd.concat(ex.map(self.createParticipants, createRecords))
+            keyCols = [
+                col
+                for col in createRecords.columns
+                if col in ["PPID", "eMPI"] or ("#mrn" in col.lower() and "pmi#" in col.lower())
+            ]
+            updateRecords, createRecords = self.resumeCheckpoints("participant", updateRecords, createRecords, keyCols)
 
-                createRecords = [self.createParticipants(record) for record in createRecords]
+            updateRecords = self.pushRecords(updateRecords, self.updateParticipants)
+            createRecords = self.pushRecords(createRecords, self.createParticipants)
 
             filt = self.recordDF["CP Short Title"] == shortTitle
 
@@ -1755,7 +2605,12 @@ class Integration(Settings):
                 self.recordDF.loc[filt, "Participant Original CP"] = None
 
             self.recordDF.dropna(axis=1, how="all", inplace=True)
-            self.recordDF.to_csv(self.currentItem, index=False)
+            self.compactRecord()
+
+        #  every row of the file has now been through this stage, so an upload of the same file later on starts from scratch -- unless
+        #  the file is one batch of a larger one, whose checkpoints are kept until the whole file is done (see uploadFile)
+        if not self.streamingFile:
+            self.checkpoints.clear(self.currentFileHash, "participant")
 
     #  ---------------------------------------------------------------------
 
@@ -1797,7 +2652,7 @@ class Integration(Settings):
             df = df.loc[~criticalFilt]
 
         # catching errors for fields which have known, pre-defined permissible values
-        self.dropdownDF = pd.read_csv(self.dropdownOutpath.replace("_", f"{env}_all_dropdown_values"), dtype=str)
+        self.dropdownDF = self.readTable(self.dropdownOutpath.replace("_", f"{env}_all_dropdown_values"), dtype=str)
 
         dropdownCols = {"Gender": "gender", "Vital Status": "vital_status"}
         dropdownCols = {key: val for key, val in dropdownCols.items() if key in df.columns}
@@ -1883,7 +2738,7 @@ class Integration(Settings):
             if duplicateFilt.any():
                 self.recordDF.loc[duplicateFilt, "Duplicate Participant"] = "True"
 
-        self.recordDF.to_csv(self.currentItem, index=False)
+        self.compactRecord()
         return df
 
     #  ---------------------------------------------------------------------
@@ -1891,222 +2746,157 @@ class Integration(Settings):
     def matchParticipants(self, participantDF, shortTitle, matchPPID):
         """Attempts to match participants in the data to existing profile for that participant in OpS"""
 
-        if matchPPID and participantDF["Participant ID"].isna().any():
-
-            filt = (participantDF["PPID"].notna()) & (participantDF["Participant ID"].isna())
-
-            if filt.any():
-
-                print("Matching Participants on PPID")
-
-                matchDF = participantDF.loc[filt].copy()
-                matchParticipantDF = self.chunkDF(matchDF, chunkSize=self.lookUpChunkSize)
-                matchedDF = pd.concat([self.matchParticipantPPID(df, shortTitle) for df in matchParticipantDF])
-
-                participantDF.update(matchedDF)
-
-        if participantDF["Participant ID"].isna().any():
-
-            if "eMPI" in participantDF.columns and not participantDF["eMPI"].empty:
-
-                filt = (participantDF["eMPI"].notna()) & (participantDF["Participant ID"].isna())
-
-                if filt.any():
-
-                    print("Matching Participants on eMPI")
-
-                    matchDF = participantDF.loc[filt].copy()
-                    matchParticipantDF = self.chunkDF(matchDF, chunkSize=self.lookUpChunkSize)
-                    matchedDF = pd.concat([self.matchParticipantEMPI(df, shortTitle) for df in matchParticipantDF])
+        if "Participant Match Key" not in participantDF.columns:
+            participantDF["Participant Match Key"] = None
 
-                    participantDF.update(matchedDF)
+        if "Participant Match Key" not in self.recordDF.columns:
+            self.recordDF["Participant Match Key"] = None
 
-        if participantDF["Participant ID"].isna().any():
+        filt = participantDF["Participant ID"].isna()
 
-            siteCols = [col for col in participantDF.columns if "#site" in col.lower() and "pmi#" in col.lower()]
-            mrnCols = [col for col in participantDF.columns if "#mrn" in col.lower() and "pmi#" in col.lower()]
-
-            for siteCol, mrnCol in zip(siteCols, mrnCols):
-
-                if not participantDF[siteCol].empty and not participantDF[mrnCol].empty:
-
-                    sites = participantDF[siteCol].unique()
-
-                    for site in sites:
+        if filt.any():
 
-                        filt = (
-                            (participantDF[siteCol] == site)
-                            & (participantDF[mrnCol].notna())
-                            & (participantDF["Participant ID"].isna())
-                        )
+            print("Matching Participants on " + ("PPID, eMPI, and MRN" if matchPPID else "eMPI and MRN"))
 
-                        if filt.any():
+            matchDF = participantDF.loc[filt].copy()
 
-                            print(f"Matching Participants on MRN Site: {site}")
+            #  every key of a participant goes into the one combined query, so chunks are sized by their number of keys
+            keyCols = [col for col in matchDF.columns if "#mrn" in col.lower() and "pmi#" in col.lower()]
+            keyCols += ["eMPI"] if "eMPI" in matchDF.columns else []
+            keyCols += ["PPID"] if matchPPID else []
+            weights = matchDF[keyCols].notna().sum(axis=1)
 
-                            matchDF = participantDF.loc[filt].copy()
-                            matchParticipantDF = self.chunkDF(matchDF, chunkSize=self.lookUpChunkSize)
-                            matchedDF = pd.concat(
-                                [self.matchParticipantMRN(df, shortTitle, site, mrnCol) for df in matchParticipantDF]
-                            )
+            matchedDF = self.lookUpChunks(matchDF, self.matchParticipantKeys, shortTitle, matchPPID, weights=weights)
 
-                            participantDF.update(matchedDF)
+            participantDF.update(matchedDF)
 
         return participantDF
 
     #  ---------------------------------------------------------------------
 
-    def matchParticipantEMPI(self, data, shortTitle):
-        """Uses participant EMPI to attempt to match an existing profile in OpS"""
-
-        token = self.authTokens[self.currentEnv]
-        headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
-        url = (
-            self.baseURL.replace("_", "") if self.currentEnv == "prod" else self.baseURL.replace("_", self.currentEnv)
-        ) + self.queryExtension
-
-        labels = data["eMPI"].map((lambda x: f'"{x}"')).copy()
-        matchVals = ", ".join(labels.to_list())
+    def matchParticipantKeys(self, data, shortTitle, matchPPID):
+        """Matches participants on every key at once (PPID, eMPI, and each MRN site) with one combined query, then applies the
+        first key to match for each participant, in that order of precedence"""
 
-        with httpx.Client(headers=headers, timeout=20) as client:
+        #  keys in order of precedence, as [label, identity index kind, AQL predicate, values to match]
+        keys = []
 
-            reply = client.post(
-                url,
-                data=jp.encode(
-                    {
-                        "cpId": -1,
-                        "aql": self.participanteMPIMatchAQL.replace("_", matchVals),
-                    },
-                    unpicklable=False,
-                ),
-            )
+        if matchPPID:
+            keys.append(["PPID", "PPID", "Participant.ppid in (_)", data["PPID"].dropna()])
 
-        participantDetails = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
-        participantDetails.set_index("eMPI", inplace=True)
+        if "eMPI" in data.columns:
+            keys.append(["eMPI", "eMPI", "Participant.empi in (_)", data["eMPI"].dropna()])
 
-        # below should be able to update Participant ID (ID for highest level shared info) and CPR ID (ID of profile specific to a given CP)
-        filt = participantDetails["Participant Original CP"] == shortTitle
-        participantsInCP = participantDetails.loc[filt].copy()
+        siteCols = [col for col in data.columns if "#site" in col.lower() and "pmi#" in col.lower()]
+        mrnCols = [col for col in data.columns if "#mrn" in col.lower() and "pmi#" in col.lower()]
 
-        # below should be able to update Participant ID, but not CPR ID, since they were not identified in the CP of interest
-        # filters out participants which are in CP of interest *and* some other CP with eMPI in other DF, then negating the filter
-        filt = filt & (participantDetails.index.isin(participantsInCP.index))
-        participantsInOtherCP = participantDetails.loc[~filt].copy()
-        participantsInOtherCP.drop(columns=["CPR ID"], inplace=True)
-        participantsInOtherCP.drop_duplicates(subset=["Participant ID"], inplace=True)
+        for siteCol, mrnCol in zip(siteCols, mrnCols):
 
-        ind = data.index.copy()
-        data.set_index("eMPI", inplace=True)
-        data.update(participantsInOtherCP)
-        data.update(participantsInCP)
-        data.reset_index(inplace=True)
-        data.index = ind
+            for site in data[siteCol].dropna().unique():
 
-        cols = ["Participant ID", "CPR ID", "Participant Original CP"]
-        self.recordDF.loc[data.index, cols] = data[cols]
-        self.recordDF.to_csv(self.currentItem, index=False)
+                predicate = (
+                    f'(Participant.medicalRecord.mrnSiteName = "{site}" '
+                    + "and Participant.medicalRecord.medicalRecordNumber in (_))"
+                )
+                values = data.loc[data[siteCol] == site, mrnCol].dropna()
+                keys.append([f"MRN ({site})", f"MRN#{site}", predicate, values])
 
-        return data
+        index = self.getIdentityIndex(self.currentEnv)
+        candidates = {}
+        predicates = []
 
-    #  ---------------------------------------------------------------------
+        for label, kind, predicate, values in keys:
 
-    def matchParticipantMRN(self, data, shortTitle, site, mrnCol):
-        """Uses participant MRN to attempt to match an existing profile in OpS"""
+            candidates[label] = {} if self.verifyIdentities else index.get(kind, values.unique().tolist())
+            missing = [value for value in values.unique() if value not in candidates[label]]
 
-        token = self.authTokens[self.currentEnv]
-        headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
-        url = (
-            self.baseURL.replace("_", "") if self.currentEnv == "prod" else self.baseURL.replace("_", self.currentEnv)
-        ) + self.queryExtension
+            if missing:
+                predicates.append(predicate.replace("_", ", ".join([f'"{value}"' for value in missing])))
 
-        labels = data[mrnCol].map((lambda x: f'"{x}"')).copy()
-        matchVals = ", ".join(labels.to_list())
+        if predicates:
 
-        with httpx.Client(headers=headers, timeout=20) as client:
+            token = self.authTokens[self.currentEnv]
+            headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
+            url = (
+                self.baseURL.replace("_", "")
+                if self.currentEnv == "prod"
+                else self.baseURL.replace("_", self.currentEnv)
+            ) + self.queryExtension
 
-            reply = client.post(
+            reply = self.sendRequest(
+                self.currentEnv,
+                "POST",
                 url,
-                data=jp.encode(
-                    {
-                        "cpId": -1,
-                        "aql": self.participantMRNMatchAQL.replace("_", matchVals)
-                        .replace("*", site)
-                        .replace("$", mrnCol),
-                    },
-                    unpicklable=False,
+                headers=headers,
+                content=encodeBody(
+                    {"cpId": -1, "aql": self.participantCombinedMatchAQL.replace("_", " or ".join(predicates))}
                 ),
             )
 
-        participantDetails = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
-        participantDetails.set_index(mrnCol, inplace=True)
+            participantDetails = pd.DataFrame(
+                data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str
+            )
 
-        # below should be able to update Participant ID (ID for highest level shared info) and CPR ID (ID of profile specific to a given CP)
-        filt = participantDetails["Participant Original CP"] == shortTitle
-        participantsInCP = participantDetails.loc[filt].copy()
+            # each row carries every key of its participant, so it is sorted back into whichever key(s) it matched
+            for label, kind, predicate, values in keys:
 
-        # below should be able to update Participant ID, but not CPR ID, since they were not identified in the CP of interest
-        # filters out participants which are in CP of interest *and* some other CP with eMPI in other DF, then negating the filter
-        filt = filt & (participantDetails.index.isin(participantsInCP.index))
-        participantsInOtherCP = participantDetails.loc[~filt].copy()
-        participantsInOtherCP.drop(columns=["CPR ID"], inplace=True)
-        participantsInOtherCP.drop_duplicates(subset=["Participant ID"], inplace=True)
+                if label == "PPID" or label == "eMPI":
+                    filt = participantDetails[label].isin(values)
+                    keyCol = label
 
-        ind = data.index.copy()
-        data.set_index(mrnCol, inplace=True)
-        data.update(participantsInOtherCP)
-        data.update(participantsInCP)
-        data.reset_index(inplace=True)
-        data.index = ind
+                else:
+                    site = kind.split("#", 1)[1]
+                    filt = (participantDetails["MRN Site"] == site) & participantDetails["MRN"].isin(values)
+                    keyCol = "MRN"
 
-        cols = ["Participant ID", "CPR ID", "Participant Original CP"]
-        self.recordDF.loc[data.index, cols] = data[cols]
-        self.recordDF.to_csv(self.currentItem, index=False)
+                resultCols = ["Participant Original CP", "Participant ID", "CPR ID"]
+                fetched = {
+                    key: group[resultCols].drop_duplicates().to_dict("records")
+                    for key, group in participantDetails.loc[filt].groupby(keyCol)
+                    if key not in candidates[label]
+                }
 
-        return data
+                index.replace(kind, fetched)
+                candidates[label].update(fetched)
 
-    #  ---------------------------------------------------------------------
+        unmatched = set(data.index)
 
-    def matchParticipantPPID(self, data, shortTitle):
-        """Uses participant PPID to attempt to match an existing profile in OpS"""
+        for label, kind, predicate, values in keys:
 
-        token = self.authTokens[self.currentEnv]
-        headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
-        url = (
-            self.baseURL.replace("_", "") if self.currentEnv == "prod" else self.baseURL.replace("_", self.currentEnv)
-        ) + self.queryExtension
+            for ind, value in values.items():
 
-        labels = data["PPID"].map((lambda x: f'"{x}"')).copy()
-        matchVals = ", ".join(labels.to_list())
+                if ind not in unmatched or value not in candidates[label]:
+                    continue
 
-        with httpx.Client(headers=headers, timeout=20) as client:
+                rows = candidates[label][value]
+                inCP = [row for row in rows if row["Participant Original CP"] == shortTitle]
 
-            reply = client.post(
-                url,
-                data=jp.encode(
-                    {
-                        "cpId": -1,
-                        "aql": self.participantPPIDMatchAQL.replace("_", matchVals),
-                    },
-                    unpicklable=False,
-                ),
-            )
+                # a profile in the CP of interest gives both IDs, one only found in other CPs gives just the Participant ID
+                if inCP:
+                    data.loc[ind, ["Participant ID", "CPR ID", "Participant Original CP"]] = [
+                        inCP[0]["Participant ID"],
+                        inCP[0]["CPR ID"],
+                        shortTitle,
+                    ]
 
-        participantDetails = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
-        participantDetails.set_index("PPID", inplace=True)
+                elif label != "PPID":
+                    data.loc[ind, ["Participant ID", "Participant Original CP"]] = [
+                        rows[0]["Participant ID"],
+                        rows[0]["Participant Original CP"],
+                    ]
 
-        # below should be able to update Participant ID (ID for highest level shared info) and CPR ID (ID of profile specific to a given CP)
-        filt = participantDetails["Participant Original CP"] == shortTitle
-        participantsInCP = participantDetails.loc[filt].copy()
+                else:
+                    continue
 
-        ind = data.index.copy()
-        data.set_index("PPID", inplace=True)
-        data.update(participantsInCP)
-        data.reset_index(inplace=True)
-        data.index = ind
+                data.loc[ind, "Participant Match Key"] = label
+                unmatched.discard(ind)
 
-        cols = ["Participant ID", "CPR ID", "Participant Original CP"]
-        self.recordDF.loc[data.index, cols] = data[cols]
-        self.recordDF.to_csv(self.currentItem, index=False)
+        cols = ["Participant ID", "CPR ID", "Participant Original CP", "Participant Match Key"]
+
+        #  look ups run concurrently (see lookUpChunks), so writes to the shared record are serialized
+        with self.recordLock:
+            self.recordDF.loc[data.index, cols] = data[cols]
+            self.journalRecord(data.index, cols)
 
         return data
 
@@ -2128,9 +2918,9 @@ class Integration(Settings):
                 criticalFilt, "Critical Error - Participant"
             ] = f"Value Error in Critical Column(s) [{', '.join(participantCritical)}]"
             self.recordDF.update(df)
+            self.journalRecord(criticalErrors.index, ["Critical Error - Participant"])
             df = df.loc[~criticalFilt]
 
-        self.recordDF.to_csv(self.currentItem, index=False)
         return df
 
     #  ---------------------------------------------------------------------
@@ -2138,29 +2928,9 @@ class Integration(Settings):
     def getPPIDByParticipantID(self, data, shortTitle):
         """Uses participant ID and the CP short title where the matched profile resides to look up the associated PPID"""
 
-        token = self.authTokens[self.currentEnv]
-        headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
-        url = (
-            self.baseURL.replace("_", "") if self.currentEnv == "prod" else self.baseURL.replace("_", self.currentEnv)
-        ) + self.queryExtension
-
-        labels = data["Participant ID"].copy()
-        matchVals = ", ".join(labels.to_list())
-
-        with httpx.Client(headers=headers, timeout=20) as client:
-
-            reply = client.post(
-                url,
-                data=jp.encode(
-                    {
-                        "cpId": -1,
-                        "aql": self.participantIDMatchAQL.replace("_", matchVals),
-                    },
-                    unpicklable=False,
-                ),
-            )
-
-        participantDetails = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
+        participantDetails = self.lookUpIdentities(
+            data["Participant ID"], (lambda matchVals: self.participantIDMatchAQL.replace("_", matchVals)), formatKey=str
+        )
         participantDetails.set_index("Participant ID", inplace=True)
 
         # below should be able to update Participant ID (ID for highest level shared info) and CPR ID (ID of profile specific to a given CP)
@@ -2173,83 +2943,78 @@ class Integration(Settings):
         data.reset_index(inplace=True)
         data.index = ind
 
-        self.recordDF.loc[data.index, "PPID"] = data["PPID"]
-        self.recordDF.to_csv(self.currentItem, index=False)
+        #  look ups run concurrently (see lookUpChunks), so writes to the shared record are serialized
+        with self.recordLock:
+            self.recordDF.loc[data.index, "PPID"] = data["PPID"]
+            self.journalRecord(data.index, ["PPID"])
 
         return data
 
     #  ---------------------------------------------------------------------
 
-    def buildParticipantObj(self, data):
-        """Constructs the participant object which will ultimately be serialized and uploaded"""
-
-        #  putting mrn sites and vals into lists
-        siteNames = [
-            data[site]
-            for site in data.keys()
-            if "#site" in site.lower() and "pmi#" in site.lower() and pd.notna(data[site])
-        ]
-        mrnVals = [
-            data[mrnVal]
-            for mrnVal in data.keys()
-            if "#mrn" in mrnVal.lower() and "pmi#" in mrnVal.lower() and pd.notna(data[mrnVal])
-        ]
+    def buildParticipantObjs(self, df):
+        """Constructs the participant objects which will ultimately be serialized and uploaded, for every record of df at once"""
+
+        #  working out which columns feed which keys once, rather than once per record
+        cols = [col for col in df.columns]
+        siteCols = [col for col in cols if "#site" in col.lower() and "pmi#" in col.lower()]
+        mrnCols = [col for col in cols if "#mrn" in col.lower() and "pmi#" in col.lower()]
+        raceCols = [col for col in cols if "race" in col.lower()]
+        ethnicityCols = [col for col in cols if "ethnicity" in col.lower()]
+
+        participantMap = {
+            "firstName": "First Name",
+            "middleName": "Middle Name",
+            "lastName": "Last Name",
+            "uid": "SSN",
+            "birthDate": "Date Of Birth",
+            "vitalStatus": "Vital Status",
+            "deathDate": "Death Date",
+            "gender": "Gender",
+            "activityStatus": "Participant Activity Status",
+            "empi": "eMPI",
+            "code": "Participant ID",
+        }
 
-        # catching cases with redundant MRN sites (set drops duplicates) and cases where the mrn number has non-digit characters -- if caught, log the error and skip the record
-        # note that set will put siteNames in alphabetical order -- it is ok in this case because the original list is used when logging in the else statement
-        if len(set(siteNames)) < len(siteNames) or not all(map(str.isdigit, mrnVals)):
+        registrationMap = {
+            "registrationDate": "Registration Date",
+            "activityStatus": "Registration Activity Status",
+            "ppid": "PPID",
+            "externalSubjectId": "External Subject ID",
+            "code": "CPR ID",
+        }
 
-            self.recordDF.loc[data.name, "Critical Error - Participant"] = "Duplicate MRNs"
-            self.recordDF.to_csv(self.currentItem, index=False)
+        participantMap = {key: val for key, val in participantMap.items() if val in cols}
+        registrationMap = {key: val for key, val in registrationMap.items() if val in cols}
+        plans = self.planExtensions(df)
 
-            data["Participant Obj"] = None
+        objs = []
+        duplicateMRNs = []
 
-            return data
+        for ind, data in zip(df.index, df.to_dict("records")):
 
-        else:
+            #  putting mrn sites and vals into lists
+            siteNames = [data[col] for col in siteCols if pd.notna(data[col])]
+            mrnVals = [data[col] for col in mrnCols if pd.notna(data[col])]
 
-            participant = Generic()
-            registration = Generic()
+            # catching cases with redundant MRN sites (set drops duplicates) and cases where the mrn number has non-digit characters -- if caught, log the error and skip the record
+            if len(set(siteNames)) < len(siteNames) or not all(map(str.isdigit, mrnVals)):
+                duplicateMRNs.append(ind)
+                objs.append(None)
+                continue
 
-            cols = data.keys()
-            cpDF = self.setCPDF()
             cpShortTitle = data["CP Short Title"]
-            formExten = self.formExtension[cpShortTitle]
-            exten = Extension()
-
-            #  if so, we should account for that in our data source as well as in our upload, so we get the required form id and name, and set the form data frame
-            if formExten:
-                exten = self.buildExtensionDetail(formExten, data)
 
-            #  making individual dicts for each mrn site and corresponding val
-            pmis = [
-                {"siteName": site, "mrn": int(mrnVal)}
-                for site, mrnVal in zip(siteNames, mrnVals)
-                if siteNames and mrnVals
-            ]
+            participant = ParticipantPayload(
+                **{key: data[val] for key, val in participantMap.items() if pd.notna(data[val])}
+            )
 
             #  putting races and ethnicities into lists
-            races = [data.get(col) for col in cols if "race" in col.lower() and pd.notna(data.get(col))]
-            ethnicities = [data.get(col) for col in cols if "ethnicity" in col.lower() and pd.notna(data.get(col))]
-
-            participantMap = {
-                "firstName": "First Name",
-                "middleName": "Middle Name",
-                "lastName": "Last Name",
-                "uid": "SSN",
-                "birthDate": "Date Of Birth",
-                "vitalStatus": "Vital Status",
-                "deathDate": "Death Date",
-                "gender": "Gender",
-                "activityStatus": "Participant Activity Status",
-                "empi": "eMPI",
-                "code": "Participant ID",
-            }
+            races = [data[col] for col in raceCols if pd.notna(data[col])]
+            ethnicities = [data[col] for col in ethnicityCols if pd.notna(data[col])]
 
-            participantData = {key: data.get(val) for key, val in participantMap.items() if pd.notna(data.get(val))}
-
-            for key, val in participantData.items():
-                setattr(participant, key, val)
+            #  making individual dicts for each mrn site and corresponding val
+            pmis = [{"siteName": site, "mrn": int(mrnVal)} for site, mrnVal in zip(siteNames, mrnVals)]
 
             if races:
                 participant.races = races
@@ -2258,47 +3023,45 @@ class Integration(Settings):
             if pmis:
                 participant.pmis = pmis
 
-            participant.extensionDetail = exten
-
-            registrationMap = {
-                "registrationDate": "Registration Date",
-                "activityStatus": "Registration Activity Status",
-                "ppid": "PPID",
-                "externalSubjectId": "External Subject ID",
-                "code": "CPR ID",
-            }
-
-            registrationData = {key: data.get(val) for key, val in registrationMap.items() if pd.notna(data.get(val))}
-
-            for key, val in registrationData.items():
-                setattr(registration, key, val)
+            participant.extensionDetail = self.extensionObj(plans.get(cpShortTitle), data)
 
+            registration = RegistrationPayload(
+                **{key: data[val] for key, val in registrationMap.items() if pd.notna(data[val])}
+            )
             registration.cpShortTitle = cpShortTitle
             registration.participant = participant
 
-            data["Participant Obj"] = registration
+            objs.append(registration)
 
-            return data
+        if duplicateMRNs:
+            self.recordDF.loc[duplicateMRNs, "Critical Error - Participant"] = "Duplicate MRNs"
+            self.journalRecord(duplicateMRNs, ["Critical Error - Participant"])
+
+        return pd.Series(objs, index=df.index, dtype=object)
 
     #  ---------------------------------------------------------------------
 
     def updateParticipants(self, data):
         """Pushes data associated with participants matched in the CP of interest (hence update)"""
 
-        async def updateLogic(data):
-            token = self.authTokens[self.currentEnv]
+        async def updateLogic(data, bodies):
+            token = await self.authTokenAsync(self.currentEnv)
             headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
 
-            async with httpx.AsyncClient(headers=headers, timeout=20) as client:
-
-                tasks = [
-                    client.put(
-                        data.loc[ind, "Participant Url"],
-                        data=jp.encode(data.loc[ind, "Participant Obj"], unpicklable=False),
-                    )
-                    for ind in data.index
-                ]
-                replies = await asyncio.gather(*tasks)
+            t1 = time.perf_counter()
+            tasks = [
+                self.sendRequestAsync(
+                    self.currentEnv,
+                    "PUT",
+                    data.loc[ind, "Participant Url"],
+                    content=body,
+                    headers=headers,
+                )
+                for ind, body in zip(data.index, bodies)
+            ]
+            replies = await asyncio.gather(*tasks)
+            self.concurrency.observe(replies, time.perf_counter() - t1)
+            self.checkpointReplies("participant", data.index, replies)
 
             ppids = [
                 ([reply.json()[0]["code"], reply.json()[0]["message"]] if reply.is_error else reply.status_code)
@@ -2313,31 +3076,39 @@ class Integration(Settings):
             )
 
             self.recordDF.loc[data.index, "Participant Upload Status"] = data["Participant Upload Status"]
-            self.recordDF.to_csv(self.currentItem, index=False)
+            self.journalRecord(data.index, ["Participant Upload Status"])
 
             return data
 
-        return asyncio.run(updateLogic(data))
+        #  bodies are encoded up front, off the event loop
+        return self.runAsync(updateLogic(data, encodeBodies(data["Participant Obj"])))
 
     #  ---------------------------------------------------------------------
 
     def createParticipants(self, data):
         """Pushes data associated with participants which failed to match in CP of interest, or OpS in general, in order to create them"""
 
-        async def createLogic(data):
-            token = self.authTokens[self.currentEnv]
+        async def createLogic(data, bodies):
+            token = await self.authTokenAsync(self.currentEnv)
             headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
 
-            async with httpx.AsyncClient(headers=headers, timeout=20) as client:
+            self.checkpointRows("participant", data.index, "pending")
 
-                tasks = [
-                    client.post(
-                        data.loc[ind, "Participant Url"],
-                        data=jp.encode(data.loc[ind, "Participant Obj"], unpicklable=False),
-                    )
-                    for ind in data.index
-                ]
-                replies = await asyncio.gather(*tasks)
+            t1 = time.perf_counter()
+            tasks = [
+                self.sendRequestAsync(
+                    self.currentEnv,
+                    "POST",
+                    data.loc[ind, "Participant Url"],
+                    content=body,
+                    headers=headers,
+                )
+                for ind, body in zip(data.index, bodies)
+            ]
+            replies = await asyncio.gather(*tasks)
+            self.concurrency.observe(replies, time.perf_counter() - t1)
+            self.checkpointReplies("participant", data.index, replies)
+            self.indexCreatedRecords(replies, "participant")
 
             ppids = [
                 (
@@ -2360,11 +3131,12 @@ class Integration(Settings):
             data["PPID"] = data["PPID"].map((lambda x: f"Participant Create Result: {x}"))
             self.recordDF.loc[data.index, "Participant Upload Status"] = data["PPID"]
 
-            self.recordDF.to_csv(self.currentItem, index=False)
+            self.journalRecord(data.index, ["PPID", "Participant Upload Status"])
 
             return data
 
-        return asyncio.run(createLogic(data))
+        #  bodies are encoded up front, off the event loop
+        return self.runAsync(createLogic(data, encodeBodies(data["Participant Obj"])))
 
     #  ---------------------------------------------------------------------
 
@@ -2401,7 +3173,7 @@ class Integration(Settings):
 
             print("Building Visits")
 
-            visitDF = visitDF.apply(self.buildVisitObj, axis=1)
+            visitDF["Visit Obj"] = self.buildVisitObjs(visitDF)
 
             updateFilt = visitDF["Visit ID"].notna()
 
@@ -2416,36 +3188,21 @@ class Integration(Settings):
             )
             visitDF.loc[~updateFilt, "Visit Url"] = base + self.visitExtension.replace("_", "")
 
-            updateRecords = self.chunkDF(visitDF.loc[updateFilt].copy())
-
+            updateRecords = visitDF.loc[updateFilt].copy()
             createRecords = self.visitNoMatchValidation(visitDF.loc[~updateFilt].copy())
-            createRecords = self.chunkDF(createRecords)
+            updateRecords, createRecords = self.resumeCheckpoints("visit", updateRecords, createRecords, ["Visit Name"])
 
-            if updateRecords and createRecords:
+            if not updateRecords.empty and not createRecords.empty:
                 print("On Update and Create Visits")
 
-                # with ThreadPoolExecutor(2) as ex:
-                #     ex.map(self.updateVisits, updateRecords)
-                #     ex.map(self.createVisits, createRecords)
-
-                updated = [self.updateVisits(record) for record in updateRecords]
-                created = [self.createVisits(record) for record in createRecords]
-
-            elif updateRecords:
+            elif not updateRecords.empty:
                 print("On Update Visits")
 
-                # with ThreadPoolExecutor(2) as ex:
-                #     ex.map(self.updateVisits, updateRecords)
-
-                updated = [self.updateVisits(record) for record in updateRecords]
-
-            else:
+            elif not createRecords.empty:
                 print("On Create Visits")
 
-                # with ThreadPoolExecutor(2) as ex:
-                #     ex.map(self.createVisits, createRecords)
-
-                created = [self.createVisits(record) for record in createRecords]
+            updated = self.pushRecords(updateRecords, self.updateVisits)
+            created = self.pushRecords(createRecords, self.createVisits)
 
             filt = self.recordDF["CP Short Title"] == shortTitle
 
@@ -2468,7 +3225,12 @@ class Integration(Settings):
                 self.recordDF.loc[filt, "Visit Original CP"] = None
 
             self.recordDF.dropna(axis=1, how="all", inplace=True)
-            self.recordDF.to_csv(self.currentItem, index=False)
+            self.compactRecord()
+
+        #  every row of the file has now been through this stage, so an upload of the same file later on starts from scratch -- unless
+        #  the file is one batch of a larger one, whose checkpoints are kept until the whole file is done (see uploadFile)
+        if not self.streamingFile:
+            self.checkpoints.clear(self.currentFileHash, "visit")
 
     #  ---------------------------------------------------------------------
 
@@ -2486,7 +3248,7 @@ class Integration(Settings):
             self.recordDF[internalCols] = None
 
         # catching errors for fields which have known, pre-defined permissible values
-        self.dropdownDF = pd.read_csv(self.dropdownOutpath.replace("_", f"{env}_all_dropdown_values"), dtype=str)
+        self.dropdownDF = self.readTable(self.dropdownOutpath.replace("_", f"{env}_all_dropdown_values"), dtype=str)
 
         dropdownCols = {"Clinical Status": "clinical_status", "Missed/Not Collected Reason": "missed_visit_reason"}
         dropdownCols = {key: val for key, val in dropdownCols.items() if key in df.columns}
@@ -2550,7 +3312,7 @@ class Integration(Settings):
             if duplicateFilt.any():
                 self.recordDF.loc[duplicateFilt, "Duplicate Visit"] = "True"
 
-        self.recordDF.to_csv(self.currentItem, index=False)
+        self.compactRecord()
         return df
 
     #  ---------------------------------------------------------------------
@@ -2567,8 +3329,7 @@ class Integration(Settings):
                 print("Matching Visits")
 
                 matchDF = visitDF.loc[filt].copy()
-                matchVisitDF = self.chunkDF(matchDF, chunkSize=self.lookUpChunkSize)
-                matchedDF = pd.concat([self.matchVisitName(df) for df in matchVisitDF])
+                matchedDF = self.lookUpChunks(matchDF, self.matchVisitName)
 
                 visitDF.update(matchedDF)
 
@@ -2579,29 +3340,9 @@ class Integration(Settings):
     def matchVisitName(self, data):
         """Uses visit name to attempt to match an existing visit in OpS"""
 
-        token = self.authTokens[self.currentEnv]
-        headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
-        url = (
-            self.baseURL.replace("_", "") if self.currentEnv == "prod" else self.baseURL.replace("_", self.currentEnv)
-        ) + self.queryExtension
-
-        labels = data["Visit Name"].map((lambda x: f'"{x}"')).copy()
-        matchVals = ", ".join(labels.to_list())
-
-        with httpx.Client(headers=headers, timeout=20) as client:
-
-            reply = client.post(
-                url,
-                data=jp.encode(
-                    {
-                        "cpId": -1,
-                        "aql": self.visitNameMatchAQL.replace("_", matchVals),
-                    },
-                    unpicklable=False,
-                ),
-            )
-
-        visitDetails = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
+        visitDetails = self.lookUpIdentities(
+            data["Visit Name"], (lambda matchVals: self.visitNameMatchAQL.replace("_", matchVals))
+        )
         visitDetails.set_index("Visit Name", inplace=True)
 
         ind = data.index.copy()
@@ -2611,8 +3352,11 @@ class Integration(Settings):
         data.index = ind
 
         cols = ["Visit ID", "Visit Original CP"]
-        self.recordDF.loc[data.index, cols] = data[cols]
-        self.recordDF.to_csv(self.currentItem, index=False)
+
+        #  look ups run concurrently (see lookUpChunks), so writes to the shared record are serialized
+        with self.recordLock:
+            self.recordDF.loc[data.index, cols] = data[cols]
+            self.journalRecord(data.index, cols)
 
         return data
 
@@ -2630,18 +3374,18 @@ class Integration(Settings):
         labels = data["Path. Number"].map((lambda x: f'"{x}"')).copy()
         matchVals = ", ".join(labels.to_list())
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-
-            reply = client.post(
-                url,
-                data=jp.encode(
-                    {
-                        "cpId": -1,
-                        "aql": self.visitSurgicalAccessionNumberMatchAQL.replace("_", matchVals),
-                    },
-                    unpicklable=False,
-                ),
-            )
+        reply = self.sendRequest(
+            self.currentEnv,
+            "POST",
+            url,
+            headers=headers,
+            content=encodeBody(
+                {
+                    "cpId": -1,
+                    "aql": self.visitSurgicalAccessionNumberMatchAQL.replace("_", matchVals),
+                }
+            ),
+        )
 
         visitDetails = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
         visitDetails.set_index("Visit Name", inplace=True)
@@ -2654,7 +3398,7 @@ class Integration(Settings):
 
         cols = ["Visit ID", "Visit Original CP"]
         self.recordDF.loc[data.index, cols] = data[cols]
-        self.recordDF.to_csv(self.currentItem, index=False)
+        self.journalRecord(data.index, cols)
 
         return data
 
@@ -2677,30 +3421,15 @@ class Integration(Settings):
                 criticalFilt, "Critical Error - Visit"
             ] = f"Value Error in Critical Column(s) [{', '.join(visitCritical)}]"
             self.recordDF.update(df)
+            self.journalRecord(criticalErrors.index, ["Critical Error - Visit"])
             df = df.loc[~criticalFilt]
 
-        self.recordDF.to_csv(self.currentItem, index=False)
         return df
 
     #  ---------------------------------------------------------------------
 
-    def buildVisitObj(self, data):
-        """Constructs the visit object which will ultimately be serialized and uploaded"""
-
-        formExten = self.formExtension[data["CP Short Title"]]
-
-        visit = Generic()
-
-        if formExten:
-            extensionDetail = self.buildExtensionDetail(formExten, data)
-
-        #  since it's required for specimen class, and attrsMap defaults to an empty dict, go ahead and make an empty Extension instance
-        else:
-            extensionDetail = Extension()
-
-        clinicalDiagnoses = [
-            data.get(col) for col in data.keys() if "clinical diagnosis#" in col.lower() and pd.notna(data.get(col))
-        ]
+    def buildVisitObjs(self, df):
+        """Constructs the visit objects which will ultimately be serialized and uploaded, for every record of df at once"""
 
         visitMap = {
             "name": "Visit Name",
@@ -2723,41 +3452,52 @@ class Integration(Settings):
             "code": "Visit ID",
         }
 
-        visitData = data.dropna()
-        visitData = {key: visitData[val] for key, val in visitMap.items() if val in visitData.keys()}
+        visitMap = {key: val for key, val in visitMap.items() if val in df.columns}
+        diagnosisCols = [col for col in df.columns if "clinical diagnosis#" in col.lower()]
+        plans = self.planExtensions(df)
 
-        for key, val in visitData.items():
-            setattr(visit, key, val)
+        objs = []
 
-        visit.extensionDetail = extensionDetail
+        for data in df.to_dict("records"):
 
-        if clinicalDiagnoses:
-            visit.clinicalDiagnoses = clinicalDiagnoses
+            visit = VisitPayload(**{key: data[val] for key, val in visitMap.items() if pd.notna(data[val])})
 
-        data["Visit Obj"] = visit
+            #  since it's required, and attrsMap defaults to an empty dict, forms without additional fields still get an empty one
+            visit.extensionDetail = self.extensionObj(plans.get(data["CP Short Title"]), data)
 
-        return data
+            clinicalDiagnoses = [data[col] for col in diagnosisCols if pd.notna(data[col])]
+
+            if clinicalDiagnoses:
+                visit.clinicalDiagnoses = clinicalDiagnoses
+
+            objs.append(visit)
+
+        return pd.Series(objs, index=df.index, dtype=object)
 
     #  ---------------------------------------------------------------------
 
     def updateVisits(self, data):
         """Pushes data associated with visits matched in the CP of interest (hence update)"""
 
-        async def updateLogic(data):
+        async def updateLogic(data, bodies):
 
-            token = self.authTokens[self.currentEnv]
+            token = await self.authTokenAsync(self.currentEnv)
             headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
 
-            async with httpx.AsyncClient(headers=headers, timeout=20) as client:
-
-                tasks = [
-                    client.put(
-                        data.loc[ind, "Visit Url"],
-                        data=jp.encode(data.loc[ind, "Visit Obj"], unpicklable=False),
-                    )
-                    for ind in data.index
-                ]
-                replies = await asyncio.gather(*tasks)
+            t1 = time.perf_counter()
+            tasks = [
+                self.sendRequestAsync(
+                    self.currentEnv,
+                    "PUT",
+                    data.loc[ind, "Visit Url"],
+                    content=body,
+                    headers=headers,
+                )
+                for ind, body in zip(data.index, bodies)
+            ]
+            replies = await asyncio.gather(*tasks)
+            self.concurrency.observe(replies, time.perf_counter() - t1)
+            self.checkpointReplies("visit", data.index, replies)
 
             visits = [
                 ([reply.json()[0]["code"], reply.json()[0]["message"]] if reply.is_error else reply.status_code)
@@ -2770,31 +3510,39 @@ class Integration(Settings):
             data["Visit Upload Status"] = data["Visit Upload Status"].map((lambda x: f"Visit Update Result: {x}"))
 
             self.recordDF.loc[data.index, "Visit Upload Status"] = data["Visit Upload Status"]
-            self.recordDF.to_csv(self.currentItem, index=False)
+            self.journalRecord(data.index, ["Visit Upload Status"])
 
             return data
 
-        return asyncio.run(updateLogic(data))
+        #  bodies are encoded up front, off the event loop
+        return self.runAsync(updateLogic(data, encodeBodies(data["Visit Obj"])))
 
     #  ---------------------------------------------------------------------
 
     def createVisits(self, data):
         """Pushes data associated with visits which failed to match in CP of interest in order to create them"""
 
-        async def createLogic(data):
-            token = self.authTokens[self.currentEnv]
+        async def createLogic(data, bodies):
+            token = await self.authTokenAsync(self.currentEnv)
             headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
 
-            async with httpx.AsyncClient(headers=headers, timeout=20) as client:
+            self.checkpointRows("visit", data.index, "pending")
 
-                tasks = [
-                    client.post(
-                        data.loc[ind, "Visit Url"],
-                        data=jp.encode(data.loc[ind, "Visit Obj"], unpicklable=False),
-                    )
-                    for ind in data.index
-                ]
-                replies = await asyncio.gather(*tasks)
+            t1 = time.perf_counter()
+            tasks = [
+                self.sendRequestAsync(
+                    self.currentEnv,
+                    "POST",
+                    data.loc[ind, "Visit Url"],
+                    content=body,
+                    headers=headers,
+                )
+                for ind, body in zip(data.index, bodies)
+            ]
+            replies = await asyncio.gather(*tasks)
+            self.concurrency.observe(replies, time.perf_counter() - t1)
+            self.checkpointReplies("visit", data.index, replies)
+            self.indexCreatedRecords(replies, "visit")
 
             visits = [
                 (
@@ -2817,11 +3565,12 @@ class Integration(Settings):
             data["Visit Name"] = data["Visit Name"].map((lambda x: f"Visit Create Result: {x}"))
             self.recordDF.loc[data.index, "Visit Upload Status"] = data["Visit Name"]
 
-            self.recordDF.to_csv(self.currentItem, index=False)
+            self.journalRecord(data.index, ["Visit Name", "Visit Upload Status"])
 
             return data
 
-        return asyncio.run(createLogic(data))
+        #  bodies are encoded up front, off the event loop
+        return self.runAsync(createLogic(data, encodeBodies(data["Visit Obj"])))
 
     #  ---------------------------------------------------------------------
 
@@ -2870,15 +3619,7 @@ class Integration(Settings):
 
             print("Building Specimens")
 
-            # would be interesting to do this with processpoolexecutor, as below, if possible
-            # objBuildDFs = self.chunkDF(specimenDF)
-
-            # with ProcessPoolExecutor() as ex:
-            #     # buildSpecimenObjMP just takes the chunked DFs and applies buildSpecimenObj to each
-            #     objBuildDFs = ex.map(self.buildSpecimenObjMP, objBuildDFs)
-            #     specimenDF = pd.concat(objBuildDFs)
-
-            specimenDF = specimenDF.apply(self.buildSpecimenObj, axis=1)
+            specimenDF["Specimen Obj"] = self.buildSpecimenObjs(specimenDF)
 
             updateFilt = specimenDF["Specimen ID"].notna()
 
@@ -2900,36 +3641,23 @@ class Integration(Settings):
             childFilt = createFilt & (specimenDF["Lineage"].isin(["Aliquot", "aliquot"]))
             specimenDF.loc[childFilt, "Specimen Url"] = base + self.aliquotExtension
 
-            updateRecords = self.chunkDF(specimenDF.loc[updateFilt].copy())
-
+            updateRecords = specimenDF.loc[updateFilt].copy()
             createRecords = self.specimenNoMatchValidation(specimenDF.loc[createFilt].copy())
-            createRecords = self.chunkDF(createRecords)
+            updateRecords, createRecords = self.resumeCheckpoints(
+                "specimen", updateRecords, createRecords, ["Specimen Label"]
+            )
 
-            if updateRecords and createRecords:
+            if not updateRecords.empty and not createRecords.empty:
                 print("Updating and Creating Specimens")
 
-                # with ThreadPoolExecutor(2) as ex:
-                #     ex.map(self.updateSpecimens, updateRecords)
-                #     ex.map(self.createSpecimens, createRecords)
-
-                updated = [self.updateSpecimens(record) for record in updateRecords]
-                created = [self.createSpecimens(record) for record in createRecords]
-
-            elif updateRecords:
+            elif not updateRecords.empty:
                 print("Updating Specimens")
 
-                # with ThreadPoolExecutor(2) as ex:
-                #     ex.map(self.updateSpecimens, updateRecords)
-
-                updated = [self.updateSpecimens(record) for record in updateRecords]
-
-            else:
+            elif not createRecords.empty:
                 print("Creating Specimens")
 
-                # with ThreadPoolExecutor(2) as ex:
-                #     ex.map(self.createSpecimens, createRecords)
-
-                created = [self.createSpecimens(record) for record in createRecords]
+            updated = self.pushRecords(updateRecords, self.updateSpecimens)
+            created = self.createSpecimensByLineage(createRecords)
 
             filt = (self.recordDF["CP Short Title"] == shortTitle) & (
                 self.recordDF["Specimen Original CP"] == shortTitle
@@ -2939,7 +3667,12 @@ class Integration(Settings):
                 self.recordDF.loc[filt, "Specimen Original CP"] = None
 
             self.recordDF.dropna(axis=1, how="all", inplace=True)
-            self.recordDF.to_csv(self.currentItem, index=False)
+            self.compactRecord()
+
+        #  every row of the file has now been through this stage, so an upload of the same file later on starts from scratch -- unless
+        #  the file is one batch of a larger one, whose checkpoints are kept until the whole file is done (see uploadFile)
+        if not self.streamingFile:
+            self.checkpoints.clear(self.currentFileHash, "specimen")
 
     #  ---------------------------------------------------------------------
 
@@ -2963,7 +3696,7 @@ class Integration(Settings):
             self.recordDF[internalCols] = None
 
         # catching errors for fields which have known, pre-defined permissible values
-        self.dropdownDF = pd.read_csv(self.dropdownOutpath.replace("_", f"{env}_all_dropdown_values"), dtype=str)
+        self.dropdownDF = self.readTable(self.dropdownOutpath.replace("_", f"{env}_all_dropdown_values"), dtype=str)
 
         dropdownCols = {
             "Anatomic Site": "anatomic_site",
@@ -3060,7 +3793,7 @@ class Integration(Settings):
             if duplicateFilt.any():
                 self.recordDF.loc[duplicateFilt, "Duplicate Specimen"] = "True"
 
-        self.recordDF.to_csv(self.currentItem, index=False)
+        self.compactRecord()
         return df
 
     #  ---------------------------------------------------------------------
@@ -3077,8 +3810,7 @@ class Integration(Settings):
             t1 = time.perf_counter()
 
             matchDF = specimenDF.loc[matchFilt].copy()
-            matchSpecimenDF = self.chunkDF(matchDF, chunkSize=self.lookUpChunkSize)
-            matchedDF = pd.concat([self.matchSpecimenLabel(df) for df in matchSpecimenDF])
+            matchedDF = self.lookUpChunks(matchDF, self.matchSpecimenLabel)
 
             # instead of below if/else, maybe just specimenDF.update(matchedDF) -- should avoid needing to split into unmatched and recombine, etc.
 
@@ -3099,9 +3831,7 @@ class Integration(Settings):
         matchFilt = (specimenDF["Parent Specimen Label"].notna()) & (specimenDF["Parent ID"].isna())
 
         if matchFilt.any():
-            specimenDF.loc[matchFilt] = specimenDF.loc[matchFilt].apply(
-                self.populateParentInfo, args=[specimenDF], axis=1
-            )
+            specimenDF = self.populateParentIDs(specimenDF)
 
         matchFilt = (specimenDF["Parent Specimen Label"].notna()) & (specimenDF["Parent ID"].isna())
 
@@ -3113,8 +3843,7 @@ class Integration(Settings):
 
             matchDF = specimenDF.loc[matchFilt].copy()
             matchDF.drop_duplicates(subset=["Parent Specimen Label"], inplace=True)
-            matchParentDF = self.chunkDF(matchDF, chunkSize=self.lookUpChunkSize)
-            matchedDF = pd.concat([self.matchParentSpecimenLabel(df) for df in matchParentDF])
+            matchedDF = self.lookUpChunks(matchDF, self.matchParentSpecimenLabel)
 
             specimenDF.update(matchedDF)
 
@@ -3128,12 +3857,10 @@ class Integration(Settings):
 
         if matchFilt.any():
 
-            specimenDF.loc[matchFilt] = specimenDF.loc[matchFilt].apply(
-                self.populateParentInfo, args=[specimenDF], axis=1
-            )
+            specimenDF = self.populateParentIDs(specimenDF)
 
             self.recordDF.loc[specimenDF.index, "Parent ID"] = specimenDF["Parent ID"]
-            self.recordDF.to_csv(self.currentItem, index=False)
+            self.journalRecord(specimenDF.index, ["Parent ID"])
 
         return specimenDF
 
@@ -3142,29 +3869,9 @@ class Integration(Settings):
     def matchSpecimenLabel(self, data):
         """Uses specimen label to attempt to match an existing specimen in OpS"""
 
-        token = self.authTokens[self.currentEnv]
-        headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
-        url = (
-            self.baseURL.replace("_", "") if self.currentEnv == "prod" else self.baseURL.replace("_", self.currentEnv)
-        ) + self.queryExtension
-
-        labels = data["Specimen Label"].map((lambda x: f'"{x}"')).copy()
-        matchVals = ", ".join(labels.to_list())
-
-        with httpx.Client(headers=headers, timeout=20) as client:
-
-            reply = client.post(
-                url,
-                data=jp.encode(
-                    {
-                        "cpId": -1,
-                        "aql": self.specimenMatchAQL.replace("_", matchVals),
-                    },
-                    unpicklable=False,
-                ),
-            )
-
-        specimenDetails = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
+        specimenDetails = self.lookUpIdentities(
+            data["Specimen Label"], (lambda matchVals: self.specimenMatchAQL.replace("_", matchVals))
+        )
         specimenDetails.set_index("Specimen Label", inplace=True)
 
         ind = data.index.copy()
@@ -3174,8 +3881,11 @@ class Integration(Settings):
         data.index = ind
 
         cols = ["Specimen ID", "Specimen Original CP"]
-        self.recordDF.loc[data.index, cols] = data[cols]
-        self.recordDF.to_csv(self.currentItem, index=False)
+
+        #  look ups run concurrently (see lookUpChunks), so writes to the shared record are serialized
+        with self.recordLock:
+            self.recordDF.loc[data.index, cols] = data[cols]
+            self.journalRecord(data.index, cols)
 
         return data
 
@@ -3184,29 +3894,9 @@ class Integration(Settings):
     def matchParentSpecimenLabel(self, data):
         """Uses parent specimen label to attempt to match an existing parent specimen in OpS; Required for cases where parent specimen exists in OpS but is not given in data"""
 
-        token = self.authTokens[self.currentEnv]
-        headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
-        url = (
-            self.baseURL.replace("_", "") if self.currentEnv == "prod" else self.baseURL.replace("_", self.currentEnv)
-        ) + self.queryExtension
-
-        labels = data["Parent Specimen Label"].map((lambda x: f'"{x}"')).copy()
-        matchVals = ", ".join(labels.to_list())
-
-        with httpx.Client(headers=headers, timeout=20) as client:
-
-            reply = client.post(
-                url,
-                data=jp.encode(
-                    {
-                        "cpId": -1,
-                        "aql": self.parentMatchAQL.replace("_", matchVals),
-                    },
-                    unpicklable=False,
-                ),
-            )
-
-        specimenDetails = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
+        specimenDetails = self.lookUpIdentities(
+            data["Parent Specimen Label"], (lambda matchVals: self.parentMatchAQL.replace("_", matchVals))
+        )
         specimenDetails.set_index("Parent Specimen Label", inplace=True)
 
         ind = data.index.copy()
@@ -3215,30 +3905,34 @@ class Integration(Settings):
         data.reset_index(inplace=True)
         data.index = ind
 
-        self.recordDF.loc[data.index, "Parent ID"] = data["Parent ID"]
-        self.recordDF.to_csv(self.currentItem, index=False)
+        #  look ups run concurrently (see lookUpChunks), so writes to the shared record are serialized
+        with self.recordLock:
+            self.recordDF.loc[data.index, "Parent ID"] = data["Parent ID"]
+            self.journalRecord(data.index, ["Parent ID"])
 
         return data
 
     #  ---------------------------------------------------------------------
 
-    def populateParentInfo(self, data, specimenDF):
-        """Populates the required parent specimen info into the child specimen's record"""
+    def populateParentIDs(self, specimenDF):
+        """Populates the parent specimen ID of every child specimen at once, by joining each parent label onto the IDs of the
+        parents matched or created in the file, and failing that onto the parent IDs already known by its siblings"""
 
-        filt = (specimenDF["Specimen Label"] == data["Parent Specimen Label"]) & (specimenDF["Specimen ID"].notna())
+        matchFilt = (specimenDF["Parent Specimen Label"].notna()) & (specimenDF["Parent ID"].isna())
+        parentLabels = specimenDF.loc[matchFilt, "Parent Specimen Label"]
 
-        if filt.any():
-            data["Parent ID"] = specimenDF.loc[filt, "Specimen ID"].unique()[0]
+        # parents which are matched or created in the file come first, then siblings which already know the same parent's ID
+        # in both cases the first occurrence of a label wins, should it appear more than once
+        matched = specimenDF.loc[specimenDF["Specimen ID"].notna()].drop_duplicates(subset=["Specimen Label"])
+        siblings = specimenDF.loc[specimenDF["Parent ID"].notna()].drop_duplicates(subset=["Parent Specimen Label"])
 
-        else:
-            filt = (specimenDF["Parent Specimen Label"] == data["Parent Specimen Label"]) & (
-                specimenDF["Parent ID"].notna()
-            )
+        parentIDs = parentLabels.map(matched.set_index("Specimen Label")["Specimen ID"])
+        parentIDs = parentIDs.fillna(parentLabels.map(siblings.set_index("Parent Specimen Label")["Parent ID"]))
+        parentIDs = parentIDs.dropna()
 
-            if filt.any():
-                data["Parent ID"] = specimenDF.loc[filt, "Parent ID"].unique()[0]
+        specimenDF.loc[parentIDs.index, "Parent ID"] = parentIDs
 
-        return data
+        return specimenDF
 
     #  ---------------------------------------------------------------------
 
@@ -3268,17 +3962,15 @@ class Integration(Settings):
                 criticalFilt, "Critical Error - Specimen"
             ] = f"Value Error in Critical Column(s) [{', '.join(specimenCritical)}]"
             self.recordDF.update(df)
+            self.journalRecord(criticalErrors.index, ["Critical Error - Specimen"])
             df = df.loc[~criticalFilt]
 
-        self.recordDF.to_csv(self.currentItem, index=False)
         return df
 
     #  ---------------------------------------------------------------------
 
-    def buildSpecimenObj(self, data):
-        """Constructs the specimen object which will ultimately be serialized and uploaded"""
-
-        specimen = Generic()
+    def buildSpecimenObjs(self, df):
+        """Constructs the specimen objects which will ultimately be serialized and uploaded, for every record of df at once"""
 
         specimenMap = {
             "label": "Specimen Label",
@@ -3300,33 +3992,8 @@ class Integration(Settings):
             "Id": "Specimen ID",
         }
 
-        specimenData = {key: data.get(val) for key, val in specimenMap.items() if pd.notna(data.get(val))}
-
-        for key, val in specimenData.items():
-            setattr(specimen, key, val)
-
-        if pd.notna(data.get("Visit ID")):
-            specimen.visitId = str(data["Visit ID"]).split(".")[0]
-
-        if pd.notna(data.get("Parent ID")):
-            specimen.parentId = str(data["Parent ID"]).split(".")[0]
-
         storageMap = {"name": "Container", "positionY": "Row", "positionX": "Column"}
 
-        storageLocation = {
-            key: (int(data.get(val)) if isinstance(data.get(val), float) else data.get(val))
-            for key, val in storageMap.items()
-            if pd.notna(data.get(val))
-        }
-
-        if storageLocation:
-            specimen.storageLocation = storageLocation
-
-        biohazards = [data.get(col) for col in data.keys() if "biohazard" in col.lower() and pd.notna(data.get(col))]
-
-        if biohazards:
-            specimen.biohazards = biohazards
-
         collectionEventMap = {
             "user": "Collector",
             "time": "Collection Date",
@@ -3335,11 +4002,6 @@ class Integration(Settings):
             "comments": "Collection Comments",
         }
 
-        collectionEvent = {key: data.get(val) for key, val in collectionEventMap.items() if pd.notna(data.get(val))}
-
-        if collectionEvent:
-            specimen.collectionEvent = collectionEvent
-
         receivedEventMap = {
             "user": "Receiver",
             "time": "Received Date",
@@ -3347,57 +4009,150 @@ class Integration(Settings):
             "comments": "Received Comments",
         }
 
-        receivedEvent = {key: data.get(val) for key, val in receivedEventMap.items() if pd.notna(data.get(val))}
+        #  working out which columns feed which keys once, rather than once per record
+        present = (lambda fieldMap: {key: val for key, val in fieldMap.items() if val in df.columns})
+        specimenMap = present(specimenMap)
+        storageMap = present(storageMap)
+        collectionEventMap = present(collectionEventMap)
+        receivedEventMap = present(receivedEventMap)
+        biohazardCols = [col for col in df.columns if "biohazard" in col.lower()]
+        plans = self.planExtensions(df)
 
-        if receivedEvent:
-            specimen.receivedEvent = receivedEvent
+        objs = []
 
-        if specimen.lineage not in ["Aliquot", "aliquot"]:
+        for data in df.to_dict("records"):
 
-            formExten = self.formExtension[data["CP Short Title"]]
+            specimen = SpecimenPayload(**{key: data[val] for key, val in specimenMap.items() if pd.notna(data[val])})
 
-            if formExten:
-                extensionDetail = self.buildExtensionDetail(formExten, data)
+            if pd.notna(data.get("Visit ID")):
+                specimen.visitId = str(data["Visit ID"]).split(".")[0]
 
-            #  since it's required for specimen class, and attrsMap defaults to an empty dict, go ahead and make an empty Extension instance
-            else:
-                extensionDetail = Extension()
+            if pd.notna(data.get("Parent ID")):
+                specimen.parentId = str(data["Parent ID"]).split(".")[0]
 
-            specimen.extensionDetail = extensionDetail
+            storageLocation = {
+                key: (int(data[val]) if isinstance(data[val], float) else data[val])
+                for key, val in storageMap.items()
+                if pd.notna(data[val])
+            }
 
-        # for aliquots which need to be created, can push them as an array, otherwise, must be a single object to update a specific specimen
-        elif pd.isna(data.get("Specimen ID")):
+            if storageLocation:
+                specimen.storageLocation = storageLocation
 
-            if pd.notna(data.get("Quantity")):
-                specimen = [specimen for val in range(int(data["Quantity"]))]
+            biohazards = [data[col] for col in biohazardCols if pd.notna(data[col])]
 
-            else:
-                specimen = [specimen]
+            if biohazards:
+                specimen.biohazards = biohazards
 
-        data["Specimen Obj"] = specimen
+            collectionEvent = {key: data[val] for key, val in collectionEventMap.items() if pd.notna(data[val])}
 
-        return data
+            if collectionEvent:
+                specimen.collectionEvent = collectionEvent
+
+            receivedEvent = {key: data[val] for key, val in receivedEventMap.items() if pd.notna(data[val])}
+
+            if receivedEvent:
+                specimen.receivedEvent = receivedEvent
+
+            if getattr(specimen, "lineage", None) not in ["Aliquot", "aliquot"]:
+
+                #  since it's required for specimen class, and attrsMap defaults to an empty dict, forms without additional fields still get an empty one
+                specimen.extensionDetail = self.extensionObj(plans.get(data["CP Short Title"]), data)
+
+            # for aliquots which need to be created, can push them as an array, otherwise, must be a single object to update a specific specimen
+            elif pd.isna(data.get("Specimen ID")):
+
+                if pd.notna(data.get("Quantity")):
+                    specimen = [specimen for val in range(int(data["Quantity"]))]
+
+                else:
+                    specimen = [specimen]
+
+            objs.append(specimen)
+
+        return pd.Series(objs, index=df.index, dtype=object)
+
+    #  ---------------------------------------------------------------------
+
+    def lineageLevels(self, df):
+        """Groups specimens to be created into levels, such that the parent of every specimen in a level is either not being created
+        or is created in an earlier level"""
+
+        levels = []
+        pending = df.copy()
+
+        while not pending.empty:
+
+            # specimens whose parent is still waiting to be created have to wait for it
+            waiting = pending["Parent ID"].isna() & pending["Parent Specimen Label"].isin(
+                pending["Specimen Label"].dropna()
+            )
+
+            #  a parent/child cycle can never be resolved, so those specimens go last and fail with whatever OpS makes of them
+            if waiting.all():
+                levels.append(pending)
+                break
+
+            levels.append(pending.loc[~waiting])
+            pending = pending.loc[waiting]
+
+        return levels
+
+    #  ---------------------------------------------------------------------
+
+    def createSpecimensByLineage(self, df):
+        """Creates specimens level by level (see lineageLevels), passing the IDs of newly created parents on to their children, so that
+        multi-generation files load in one run"""
+
+        results = []
+        parentIDs = {}
+
+        for level in self.lineageLevels(df):
+
+            filt = level["Parent ID"].isna() & level["Parent Specimen Label"].isin(parentIDs.keys())
+
+            if filt.any():
+                level = level.copy()
+                level.loc[filt, "Parent ID"] = level.loc[filt, "Parent Specimen Label"].map(parentIDs)
+                level.loc[filt, "Specimen Obj"] = self.buildSpecimenObjs(level.loc[filt])
+                self.recordDF.loc[level.loc[filt].index, "Parent ID"] = level.loc[filt, "Parent ID"]
+                self.journalRecord(level.loc[filt].index, ["Parent ID"])
+
+            labels = level["Specimen Label"].copy()
+            created = self.pushRecords(level, self.createSpecimens)
+            results.extend(created)
+
+            if created:
+                createdIDs = pd.concat(created)["Specimen ID"]
+                filt = labels.notna() & createdIDs.reindex(labels.index).notna()
+                parentIDs.update(dict(zip(labels.loc[filt], createdIDs.reindex(labels.index).loc[filt])))
+
+        return results
 
     #  ---------------------------------------------------------------------
 
     def updateSpecimens(self, data):
         """Pushes data associated with specimens matched in the CP of interest (hence update)"""
 
-        async def updateLogic(data):
+        async def updateLogic(data, bodies):
 
-            token = self.authTokens[self.currentEnv]
+            token = await self.authTokenAsync(self.currentEnv)
             headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
 
-            async with httpx.AsyncClient(headers=headers, timeout=20) as client:
-
-                tasks = [
-                    client.put(
-                        data.loc[ind, "Specimen Url"],
-                        data=jp.encode(data.loc[ind, "Specimen Obj"], unpicklable=False),
-                    )
-                    for ind in data.index
-                ]
-                replies = await asyncio.gather(*tasks)
+            t1 = time.perf_counter()
+            tasks = [
+                self.sendRequestAsync(
+                    self.currentEnv,
+                    "PUT",
+                    data.loc[ind, "Specimen Url"],
+                    content=body,
+                    headers=headers,
+                )
+                for ind, body in zip(data.index, bodies)
+            ]
+            replies = await asyncio.gather(*tasks)
+            self.concurrency.observe(replies, time.perf_counter() - t1)
+            self.checkpointReplies("specimen", data.index, replies)
 
             specimens = [
                 ([reply.json()[0]["code"], reply.json()[0]["message"]] if reply.is_error else reply.status_code)
@@ -3412,31 +4167,39 @@ class Integration(Settings):
             )
 
             self.recordDF.loc[data.index, "Specimen Upload Status"] = data["Specimen Upload Status"]
-            self.recordDF.to_csv(self.currentItem, index=False)
+            self.journalRecord(data.index, ["Specimen Upload Status"])
 
             return data
 
-        return asyncio.run(updateLogic(data))
+        #  bodies are encoded up front, off the event loop
+        return self.runAsync(updateLogic(data, encodeBodies(data["Specimen Obj"])))
 
     #  ---------------------------------------------------------------------
 
     def createSpecimens(self, data):
         """Pushes data associated with specimens which failed to match in CP of interest in order to create them"""
 
-        async def updateLogic(data):
-            token = self.authTokens[self.currentEnv]
+        async def updateLogic(data, bodies):
+            token = await self.authTokenAsync(self.currentEnv)
             headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
 
-            async with httpx.AsyncClient(headers=headers, timeout=20) as client:
+            self.checkpointRows("specimen", data.index, "pending")
 
-                tasks = [
-                    client.post(
-                        data.loc[ind, "Specimen Url"],
-                        data=jp.encode(data.loc[ind, "Specimen Obj"], unpicklable=False),
-                    )
-                    for ind in data.index
-                ]
-                replies = await asyncio.gather(*tasks)
+            t1 = time.perf_counter()
+            tasks = [
+                self.sendRequestAsync(
+                    self.currentEnv,
+                    "POST",
+                    data.loc[ind, "Specimen Url"],
+                    content=body,
+                    headers=headers,
+                )
+                for ind, body in zip(data.index, bodies)
+            ]
+            replies = await asyncio.gather(*tasks)
+            self.concurrency.observe(replies, time.perf_counter() - t1)
+            self.checkpointReplies("specimen", data.index, replies)
+            self.indexCreatedRecords(replies, "specimen")
 
             specimens = [
                 (
@@ -3453,6 +4216,15 @@ class Integration(Settings):
 
             print(f"Specimen Create Results: {specimens}")
 
+            #  aliquots are created as a list, in which case the first of them stands in for the row
+            data["Specimen ID"] = [
+                None
+                if reply.is_error
+                else str(reply.json()["id"])
+                if isinstance(reply.json(), dict)
+                else str(reply.json()[0]["id"])
+                for reply in replies
+            ]
             data["Specimen Label"] = specimens
 
             filt = data["Specimen Label"].map((lambda x: not isinstance(x, list)))
@@ -3461,11 +4233,12 @@ class Integration(Settings):
             data["Specimen Label"] = data["Specimen Label"].map((lambda x: f"Specimen Create Result: {x}"))
             self.recordDF.loc[data.index, "Specimen Upload Status"] = data["Specimen Label"]
 
-            self.recordDF.to_csv(self.currentItem, index=False)
+            self.journalRecord(data.index, ["Specimen Label", "Specimen Upload Status"])
 
             return data
 
-        return asyncio.run(updateLogic(data))
+        #  bodies are encoded up front, off the event loop
+        return self.runAsync(updateLogic(data, encodeBodies(data["Specimen Obj"])))
 
     #  ---------------------------------------------------------------------
 
@@ -3637,8 +4410,7 @@ class Integration(Settings):
 
         params = {"name": arrayName, "exactMatch": True}
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-            reply = client.get(url, params=params)
+        reply = self.sendRequest(self.currentEnv, "GET", url, params=params, headers=headers)
 
         if reply:
             arrayID = reply.json()[0]["id"]
@@ -3656,8 +4428,6 @@ class Integration(Settings):
     def buildArrayObj(self, data):
         """Constructs the array object which will ultimately be serialized and uploaded"""
 
-        array = Generic()
-
         arrayMap = {
             "name": "Name",
             "length": "Length (mm)",
@@ -3677,8 +4447,7 @@ class Integration(Settings):
 
         arrayData = {key: data.get(val) for key, val in arrayMap.items() if pd.notna(data.get(val))}
 
-        for key, val in arrayData.items():
-            setattr(array, key, val)
+        array = ArrayPayload(**arrayData)
 
         array.rowLabelingScheme = array.rowLabelingScheme.upper()
         array.columnLabelingScheme = array.columnLabelingScheme.upper()
@@ -3693,8 +4462,7 @@ class Integration(Settings):
         token = self.authTokens[self.currentEnv]
         headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-            reply = client.put(url, data=jp.encode(arrayObj, unpicklable=False))
+        reply = self.sendRequest(self.currentEnv, "PUT", url, content=encodeBody(arrayObj), headers=headers)
 
         reply = (
             ", ".join([reply.json()[0]["code"], reply.json()[0]["message"]]) if reply.is_error else reply.status_code
@@ -3715,8 +4483,7 @@ class Integration(Settings):
         headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
         url = f"{base}{self.arrayExtension}/"
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-            reply = client.post(url, data=jp.encode(arrayObj, unpicklable=False))
+        reply = self.sendRequest(self.currentEnv, "POST", url, content=encodeBody(arrayObj), headers=headers)
 
         reply = (
             reply.json()["id"]
@@ -3744,8 +4511,7 @@ class Integration(Settings):
         token = self.authTokens[self.currentEnv]
         headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-            reply = client.put(url, data=jp.encode(coreList, unpicklable=False))
+        reply = self.sendRequest(self.currentEnv, "PUT", url, content=encodeBody(coreList), headers=headers)
 
         reply = (
             ", ".join([reply.json()[0]["code"], reply.json()[0]["message"]]) if reply.is_error else reply.status_code
@@ -3851,8 +4617,7 @@ class Integration(Settings):
 
             uploadDataForComparison = participantDF.drop(columns=["CP ID", "DTs Processed", "Participant Original CP"])
 
-            opsDataForComparison = self.chunkDF(participantDF, chunkSize=self.lookUpChunkSize)
-            opsDataForComparison = pd.concat([self.getOpSParticipantData(df, env) for df in opsDataForComparison])
+            opsDataForComparison = self.lookUpChunks(participantDF, self.getOpSParticipantData, env)
 
             # below subsetting is required because OpS can have limitless cases where one participant is in
             # multiple CPs and not necessarily the CP(s) of interest either. leaving this unaddressed leads to
@@ -3939,6 +4704,8 @@ class Integration(Settings):
                 comparedDF = comparedDF.dropna(axis=1, how="all")
                 allCompared.append(comparedDF)
 
+        self.compactRecord()
+
         allCompared = pd.concat(allCompared)
         allCompared.to_csv(outPath)
 
@@ -3947,12 +4714,6 @@ class Integration(Settings):
     def getOpSParticipantData(self, data, env):
         """Retrieves the OpS data associated with participants given in the participant template being audited"""
 
-        token = self.authTokens[self.currentEnv]
-        headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
-        url = (
-            self.baseURL.replace("_", "") if self.currentEnv == "prod" else self.baseURL.replace("_", self.currentEnv)
-        ) + self.queryExtension
-
         labels = data["Participant ID"].copy()
         matchVals = ", ".join(labels.to_list())
 
@@ -3964,17 +4725,8 @@ class Integration(Settings):
         else:
             aql = aql.replace("$", "")
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-
-            reply = client.post(
-                url,
-                data=jp.encode(
-                    {"cpId": -1, "aql": aql, "wideRowMode": "DEEP"},
-                    unpicklable=False,
-                ),
-            )
-
-        data = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
+        #  paged, since a single query only returns up to the server's default number of results
+        data = pd.concat(self.runQueryPaged(self.currentEnv, -1, aql, wantWideRows=True), ignore_index=True)
         data.dropna(axis=1, how="all", inplace=True)
 
         columns = {
@@ -4087,8 +4839,7 @@ class Integration(Settings):
                     unmatchedVisits.to_csv(outPath, index=False)
                 continue
 
-            opsDataForComparison = self.chunkDF(visitDF, chunkSize=self.lookUpChunkSize)
-            opsDataForComparison = pd.concat([self.getOpSVisitData(df, env) for df in opsDataForComparison])
+            opsDataForComparison = self.lookUpChunks(visitDF, self.getOpSVisitData, env)
 
             uploadDataForComparison = visitDF.drop(columns=["CP ID", "DTs Processed", "Visit Original CP"])
 
@@ -4162,6 +4913,8 @@ class Integration(Settings):
                 comparedDF = comparedDF.dropna(axis=1, how="all")
                 allCompared.append(comparedDF)
 
+        self.compactRecord()
+
         allCompared = pd.concat(allCompared)
         allCompared.to_csv(outPath)
 
@@ -4170,12 +4923,6 @@ class Integration(Settings):
     def getOpSVisitData(self, data, env):
         """Retrieves the OpS data associated with visits given in the visit template being audited"""
 
-        token = self.authTokens[self.currentEnv]
-        headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
-        url = (
-            self.baseURL.replace("_", "") if self.currentEnv == "prod" else self.baseURL.replace("_", self.currentEnv)
-        ) + self.queryExtension
-
         labels = data["Visit ID"].copy()
         matchVals = ", ".join(labels.to_list())
 
@@ -4187,17 +4934,8 @@ class Integration(Settings):
         else:
             aql = aql.replace("$", "")
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-
-            reply = client.post(
-                url,
-                data=jp.encode(
-                    {"cpId": -1, "aql": aql, "wideRowMode": "DEEP"},
-                    unpicklable=False,
-                ),
-            )
-
-        data = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
+        #  paged, since a single query only returns up to the server's default number of results
+        data = pd.concat(self.runQueryPaged(self.currentEnv, -1, aql, wantWideRows=True), ignore_index=True)
         data.dropna(axis=1, how="all", inplace=True)
 
         columns = {
@@ -4305,8 +5043,7 @@ class Integration(Settings):
                     unmatchedSpecimens.to_csv(outPath, index=False)
                 continue
 
-            opsDataForComparison = self.chunkDF(specimenDF, chunkSize=self.lookUpChunkSize)
-            opsDataForComparison = pd.concat([self.getOpSSpecimenData(df, env) for df in opsDataForComparison])
+            opsDataForComparison = self.lookUpChunks(specimenDF, self.getOpSSpecimenData, env)
 
             uploadDataForComparison = specimenDF.drop(
                 columns=["CP ID", "DTs Processed", "Specimen Original CP", "Parent ID"]
@@ -4382,6 +5119,8 @@ class Integration(Settings):
                 comparedDF = comparedDF.dropna(axis=1, how="all")
                 allCompared.append(comparedDF)
 
+        self.compactRecord()
+
         allCompared = pd.concat(allCompared)
         allCompared.to_csv(outPath)
 
@@ -4390,12 +5129,6 @@ class Integration(Settings):
     def getOpSSpecimenData(self, data, env):
         """Retrieves the OpS data associated with specimens given in the specimen template being audited"""
 
-        token = self.authTokens[self.currentEnv]
-        headers = {"X-OS-API-TOKEN": token, "Content-Type": "application/json"}
-        url = (
-            self.baseURL.replace("_", "") if self.currentEnv == "prod" else self.baseURL.replace("_", self.currentEnv)
-        ) + self.queryExtension
-
         labels = data["Specimen ID"].copy()
         matchVals = ", ".join(labels.to_list())
 
@@ -4407,17 +5140,8 @@ class Integration(Settings):
         else:
             aql = aql.replace("$", "")
 
-        with httpx.Client(headers=headers, timeout=20) as client:
-
-            reply = client.post(
-                url,
-                data=jp.encode(
-                    {"cpId": -1, "aql": aql, "wideRowMode": "DEEP"},
-                    unpicklable=False,
-                ),
-            )
-
-        data = pd.DataFrame(data=reply.json()["rows"], columns=reply.json()["columnLabels"], dtype=str)
+        #  paged, since a single query only returns up to the server's default number of results
+        data = pd.concat(self.runQueryPaged(self.currentEnv, -1, aql, wantWideRows=True), ignore_index=True)
         # data.dropna(axis=1, how="all", inplace=True)
 
         columns = {
@@ -0,0 +1,75 @@
+import os
+import json
+import threading
+
+
+class RecordJournal:
+    """Append-only log of changes to the rows of an upload/audit record, so progress can be saved without rewriting the whole file --
+    each change is logged with the hash of the file it was made to, and only replayed onto a file with the same hash"""
+
+    def __init__(self, path, fileHash):
+
+        self.path = path
+        self.fileHash = fileHash
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+
+    #  ---------------------------------------------------------------------
+
+    def append(self, index, cols, values):
+        """Logs the values of the given columns for the given rows, as a single line, and syncs it to disk"""
+
+        entry = json.dumps({"fileHash": self.fileHash, "index": index, "cols": cols, "values": values}, default=str)
+
+        with self.lock:
+
+            self.file.write(entry + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    #  ---------------------------------------------------------------------
+
+    def replay(self, df):
+        """Applies every change logged for this file to df, in the order they were made, and returns the number of changes applied"""
+
+        count = 0
+
+        with self.lock:
+
+            with open(self.path, encoding="utf-8") as log:
+
+                for line in log:
+
+                    #  a crash mid-write can leave a partial last line, which is simply dropped
+                    try:
+                        entry = json.loads(line)
+
+                    except json.JSONDecodeError:
+                        continue
+
+                    #  left behind by a different file of the same name (or an edited version of this one), whose rows don't line up
+                    if entry.get("fileHash") != self.fileHash:
+                        continue
+
+                    for col in [col for col in entry["cols"] if col not in df.columns]:
+                        df[col] = None
+
+                    df.loc[entry["index"], entry["cols"]] = entry["values"]
+                    count += 1
+
+        return count
+
+    #  ---------------------------------------------------------------------
+
+    def clear(self):
+        """Empties the log, such as once the record has been written out in full"""
+
+        with self.lock:
+            self.file.truncate(0)
+
+    #  ---------------------------------------------------------------------
+
+    def close(self):
+
+        with self.lock:
+            self.file.close()
@@ -0,0 +1,44 @@
+import json
+import numpy as np
+import jsonpickle as jp
+
+from generic import Generic, Extension, Payload
+
+try:
+    import orjson  # optional -- a faster encoder for request bodies, the standard library's is used if it isn't installed
+
+except ImportError:
+    orjson = None
+
+
+def toJSONable(obj):
+    """Default hook for the encoders, turning the payload classes (and anything else they can't encode) into plain data"""
+
+    if isinstance(obj, (Generic, Extension, Payload)):
+        return obj.toDict()
+
+    #  an empty Extension's attrsMap is the dict type itself, which has always been sent as jsonpickle encodes it
+    if obj is dict:
+        return {"py/type": "builtins.dict"}
+
+    #  numpy scalars can make their way out of DataFrames
+    if isinstance(obj, np.generic):
+        return obj.item()
+
+    #  anything else is sent as jsonpickle would have sent it
+    return json.loads(jp.encode(obj, unpicklable=False))
+
+
+def encodeBody(obj):
+    """Encodes a request body (a payload object, or any combination of dicts, lists, and plain values) as JSON bytes"""
+
+    if orjson is not None:
+        return orjson.dumps(obj, default=toJSONable, option=orjson.OPT_NON_STR_KEYS)
+
+    return json.dumps(obj, default=toJSONable).encode("utf-8")
+
+
+def encodeBodies(objs):
+    """Encodes each of a sequence of request bodies, such as a column of payload objects, ahead of sending them"""
+
+    return [encodeBody(obj) for obj in objs]
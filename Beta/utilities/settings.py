@@ -1,5 +1,47 @@
 import os
 import pandas as pd
+from collections.abc import Mapping
+
+
+class Environments(Mapping):
+    """Maps each OpS env to its login credentials, reading the environmental variables behind them only when that env is first used"""
+
+    def __init__(self, references, resolve):
+
+        self.references = references
+        self.resolve = resolve
+        self.credentials = {}
+
+    #  ---------------------------------------------------------------------
+
+    def __getitem__(self, env):
+
+        if env not in self.credentials:
+            self.credentials[env] = {key: self.resolve(val) for key, val in self.references[env].items()}
+
+        return self.credentials[env]
+
+    #  ---------------------------------------------------------------------
+
+    def __contains__(self, env):
+        """Checks the configured envs only, so a missing environmental variable doesn't make an env look absent"""
+
+        return env in self.references
+
+    #  ---------------------------------------------------------------------
+
+    def __iter__(self):
+
+        return iter(self.references)
+
+    #  ---------------------------------------------------------------------
+
+    def __len__(self):
+
+        return len(self.references)
+
+
+#  ---------------------------------------------------------------------
 
 
 class Settings:
@@ -11,23 +53,27 @@ class Settings:
 
         self.baseURL = "https://openspecimen_.domain.domain.domain/rest/ng/"
 
-        self.envs = {
-            "test": {
-                "loginName": self.getEnVar("Test_Env_User"),
-                "password": self.getEnVar("Test_Env_Pass"),
-                "domainName": self.getEnVar("Test_Env_Domain"),
-            },
-            "dev": {
-                "loginName": self.getEnVar("Dev_Env_User"),
-                "password": self.getEnVar("Dev_Env_Pass"),
-                "domainName": self.getEnVar("Dev_Env_Domain"),
-            },
-            "prod": {
-                "loginName": self.getEnVar("Prod_Env_User"),
-                "password": self.getEnVar("Prod_Env_Pass"),
-                "domainName": self.getEnVar("Prod_Env_Domain"),
+        #  values are the names of the environmental variables holding each credential -- they are only read once that env is first used
+        self.envs = Environments(
+            {
+                "test": {
+                    "loginName": "Test_Env_User",
+                    "password": "Test_Env_Pass",
+                    "domainName": "Test_Env_Domain",
+                },
+                "dev": {
+                    "loginName": "Dev_Env_User",
+                    "password": "Dev_Env_Pass",
+                    "domainName": "Dev_Env_Domain",
+                },
+                "prod": {
+                    "loginName": "Prod_Env_User",
+                    "password": "Prod_Env_Pass",
+                    "domainName": "Prod_Env_Domain",
+                },
             },
-        }
+            self.getEnVar,
+        )
 
         self.translatorInputDir = "./input/translate/"
         self.pathReportInputDir = "./pathReports/"
@@ -42,6 +88,14 @@ class Settings:
         self.cpOutPath = "./resources/universalCPs.csv"
         self.dropdownOutpath = "./resources/dropdowns/_.csv"
 
+        # "parquet" keeps a typed, memory-mapped copy of each of the above tables next to its CSV, which is much faster to load -- requires
+        # pyarrow. The CSVs are still written for people to read/edit, and one edited after its parquet copy is read instead, until the next sync
+        self.tableFormat = "csv"
+
+        self.identityIndexPath = "./resources/identities/_.sqlite"  #  where _ is the env
+        self.journalPath = "./resources/journals/_.jsonl"  #  where _ is the name of the file being uploaded/audited
+        self.streamDir = "./resources/stream/"
+
         # for more info on date formats, see here: https://docs.python.org/3/library/datetime.html#strftime-and-strptime-format-codes
 
         self.dateFormat = "%m/%d/%Y"
@@ -49,14 +103,115 @@ class Settings:
         self.timezone = "US/Eastern"
         self.fillerDate = "01/01/1900"  #  date to be used when one is missing and it needs to be obviously fake
 
-        # number of async requests sent to the server at a time
+        # details of the long-lived, pooled HTTP client kept for each env -- see here for more: https://www.python-httpx.org/advanced/resource-limits/
+        self.requestTimeout = 20
+        self.maxConnections = 20
+        self.maxKeepAliveConnections = 10
+        self.keepAliveExpiry = 30  #  seconds an idle connection is kept open for reuse
+
+        # seconds a session token is used for before it is proactively renewed -- keep this below the session timeout configured in OpS
+        # tokens are fetched per env the first time that env is used, and renewed once automatically if a request is rejected with a 401
+        self.tokenRefreshAfter = 45 * 60
+
+        # number of async requests sent to the server at a time -- uploads start here, then the concurrency controller raises it
+        # by one per healthy chunk, and halves it on deadlocks, 5xx replies, or chunks slower than latencySpikeFactor x the running average
         self.asyncChunkSize = 5
+        self.minAsyncChunkSize = 1
+        self.maxAsyncChunkSize = 25
+        self.latencySpikeFactor = 2
+
+        # retrying of requests which fail for transient reasons (MySQL deadlocks, 502/503/504, timeouts) -- waits a random time up to
+        # retryBaseDelay x 2^attempt seconds (capped at retryMaxDelay) between attempts, and gives up once a job has used its retryBudget
+        self.retryAttempts = 5  #  total attempts per request, including the first
+        self.retryBaseDelay = 0.5
+        self.retryMaxDelay = 10
+        self.retryBudget = 500  #  retries allowed per imported file, so a struggling server isn't hammered indefinitely
+
+        # client-side rate limits, as [requests per second, burst size], for each class of endpoint -- requests to endpoints not listed
+        # fall under "default", and setting a limit to None removes it. envRateLimits overrides these for particular envs, i.e.
+        # {"prod": {"query": [2, 5]}}, so bulk jobs can be kept from crowding out people using the OpS GUI
+        self.rateLimits = {
+            "query": [10, 10],
+            "import-jobs": [2, 5],
+            "specimens": [20, 25],
+            "collection-protocol-registrations": [20, 25],
+            "default": [20, 25],
+        }
+        self.envRateLimits = {}
+
+        # seconds a successful reply from genericGetRequest/getFormExtension is shared with identical requests -- form extensions, CP details,
+        # etc. don't change during a run, so this saves round trips without serving data that is meaningfully stale
+        self.coalesceTTL = 120
+
+        # on-disk cache of replies from metadata endpoints, which rarely change between runs -- TTLs are in seconds, and endpoints are matched
+        # in the order given, so more specific ones come first. Expired replies are revalidated with the server (ETag/Last-Modified) if possible
+        self.responseCachePath = "./resources/responseCache.sqlite"
+        self.responseCacheMaxEntries = 5000
+        self.responseCacheTTLs = {
+            "extension-form": 24 * 60 * 60,
+            "definition": 24 * 60 * 60,
+            "forms": 60 * 60,
+            "permissible-values": 12 * 60 * 60,
+            "collection-protocols": 60 * 60,
+        }
+
+        # details of paged queries (see Integration.runQueryPaged) -- rows per page, number of pages requested at once, and seconds allowed per page
+        self.queryPageSize = 1000
+        self.queryPageConcurrency = 3
+        self.queryTimeout = 60
+
         # number of records passed to query look up -- limit to 2500 and below
         self.lookUpChunkSize = 2500
+        self.lookUpConcurrency = 4  #  number of look up chunks queried at once when matching/auditing
+
+        # matches are remembered in a local identity index for each env, and only records missing from it are looked up in OpS -- set to True
+        # to look everything up again and refresh the index, i.e. if records may have been deleted or re-labeled in OpS since the last load
+        self.verifyIdentities = False
+
+        # how far each row of an upload got is checkpointed by file hash and row, so a restarted upload skips rows which already succeeded
+        # creates which may have succeeded without a reply are only retried if they have a PPID/Visit Name/Specimen Label to match them on
+        self.resumeUploads = True
+        self.checkpointPath = "./resources/checkpoints.sqlite"
+
+        # the file hash is recomputed on every import, from every column except those below (and the "Original" date columns), which
+        # the upload itself writes back into the file -- so editing the data between runs starts the file's checkpoints over
+        self.checkpointExcludedCols = [
+            "Participant Upload Status",
+            "Visit Upload Status",
+            "Specimen Upload Status",
+            "Array Update Status",
+            "Populate Array Status",
+            "Critical Error - Participant",
+            "Critical Error - Visit",
+            "Critical Error - Specimen",
+            "Duplicate Participant",
+            "Duplicate Visit",
+            "Duplicate Specimen",
+            "Duplicate Core",
+            "Participant Original CP",
+            "Visit Original CP",
+            "Specimen Original CP",
+            "Participant Match Key",
+            "Participant ID",
+            "CPR ID",
+            "PPID",
+            "Visit ID",
+            "Visit Name",
+            "Specimen ID",
+            "Specimen Label",
+            "Parent ID",
+            "Array ID",
+            "DTs Processed",
+            "File Hash",
+        ]
+
+        # upload files larger than streamFileSizeMB are read and uploaded streamChunkRows rows at a time, so memory use stays bounded
+        # NOTE that duplicate detection and in-file parent specimens are then only resolved within each batch of rows
+        self.streamFileSizeMB = 250
+        self.streamChunkRows = 50000
 
-        self.participanteMPIMatchAQL = 'select CollectionProtocol.shortTitle as "Participant Original CP", Participant.empi as "eMPI", Participant.participantId as "Participant ID", Participant.id as "CPR ID" where Participant.empi in (_)'
-        self.participantMRNMatchAQL = 'select CollectionProtocol.shortTitle as "Participant Original CP", Participant.medicalRecord.medicalRecordNumber as "$", Participant.participantId as "Participant ID", Participant.id as "CPR ID" where Participant.medicalRecord.mrnSiteName = "*" and Participant.medicalRecord.medicalRecordNumber in (_)'
-        self.participantPPIDMatchAQL = 'select CollectionProtocol.shortTitle as "Participant Original CP", Participant.ppid as "PPID", Participant.participantId as "Participant ID", Participant.id as "CPR ID" where Participant.ppid in (_)'
+        # matches on every key at once -- where _ is the OR-ed key predicates (see Integration.matchParticipantKeys)
+        self.participantCombinedMatchAQL = 'select CollectionProtocol.shortTitle as "Participant Original CP", Participant.participantId as "Participant ID", Participant.id as "CPR ID", Participant.ppid as "PPID", Participant.empi as "eMPI", Participant.medicalRecord.mrnSiteName as "MRN Site", Participant.medicalRecord.medicalRecordNumber as "MRN" where _'
 
         # used to populate PPIDs in cases where data omits them but includes another value like MRN, etc., which can be used to match profile and get Participant ID
         self.participantIDMatchAQL = 'select CollectionProtocol.shortTitle as "Participant Original CP", Participant.ppid as "PPID", Participant.participantId as "Participant ID", Participant.id as "CPR ID" where Participant.participantId in (_)'
@@ -111,6 +266,9 @@ class Settings:
         self.requiredPaths = [
             "./resources",
             "./resources/dropdowns",
+            "./resources/identities",
+            "./resources/journals",
+            self.streamDir,
             self.translatorInputDir,
             self.pathReportInputDir,
             self.inputDir,
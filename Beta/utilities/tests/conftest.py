@@ -0,0 +1,5 @@
+import os
+import sys
+
+#  the utilities import one another as top level modules (i.e. "from settings import Settings"), so the tests do the same
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
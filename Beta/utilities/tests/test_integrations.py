@@ -0,0 +1,196 @@
+import os
+import json
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+import pandas as pd
+
+pytest.importorskip("tqdm")
+
+from integrations import Integration
+
+
+@pytest.fixture
+def integration(tmp_path, monkeypatch):
+    """An Integration working out of an empty resources folder, already logged in to dev, which it treats as its only env"""
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("./resources/dropdowns")
+    os.makedirs("./resources/journals")
+
+    integration = Integration()
+    integration.envs = {"dev": integration.envs.references["dev"]}
+    integration.authTokens.tokens["dev"] = "token"
+    integration.authTokens.issued["dev"] = time.monotonic()
+
+    yield integration
+
+    integration.closeClients()
+
+
+#  ---------------------------------------------------------------------
+
+
+def opsServer(dropdowns):
+    """A client for a fake OpS serving the given {dropdown: [values]}, which can be edited to stand in for changes made on the server"""
+
+    def handler(request):
+
+        if request.url.path.endswith("/attributes"):
+            return httpx.Response(200, json=[{"attribute": name, "pvCount": len(vals)} for name, vals in dropdowns.items()])
+
+        vals = dropdowns[request.url.params["attribute"]]
+        return httpx.Response(200, json=[{"value": val, "id": ind} for ind, val in enumerate(vals)])
+
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_sync_sees_server_side_changes(integration):
+
+    dropdowns = {"Gender": ["Female", "Male"]}
+    integration.clients["dev"] = opsServer(dropdowns)
+
+    integration.syncDropdowns()
+
+    dropdowns["Gender"].append("Unknown")
+    dropdowns["Race"] = ["White"]
+
+    integration.syncDropdowns()
+
+    dropdownDF = integration.readTable(integration.dropdownOutpath.replace("_", "dev_all_dropdown_values"), dtype=str)
+
+    assert dropdownDF["Gender"].tolist() == ["Female", "Male", "Unknown"]
+    assert dropdownDF["Race"].dropna().tolist() == ["White"]
+
+
+#  ---------------------------------------------------------------------
+
+
+def opsQueryServer(rows, columns, requested):
+    """An async client for a fake OpS query endpoint, which honors startAt/maxResults and notes the startAt of every page requested"""
+
+    def handler(request):
+
+        query = json.loads(request.content)
+        requested.append(query["startAt"])
+        page = rows[query["startAt"] : query["startAt"] + query["maxResults"]]
+
+        return httpx.Response(200, json={"columnLabels": columns, "rows": page})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_audit_query_pages_across_max_results(integration, monkeypatch):
+
+    participants = [[str(ind), "CP A"] for ind in range(5)]
+    requested = []
+
+    integration.currentEnv = "dev"
+    integration.queryPageSize = 2
+    integration.queryPageConcurrency = 2
+    integration.asyncClients["dev"] = opsQueryServer(participants, ["Participant ID", "CP Short Title"], requested)
+    monkeypatch.setattr(integration, "generatePAFAQL", (lambda data, env: None))
+
+    data = pd.DataFrame({"Participant ID": [row[0] for row in participants]})
+    opsData = integration.getOpSParticipantData(data, "dev")
+
+    assert opsData["Participant ID"].tolist() == ["0", "1", "2", "3", "4"]
+    assert sorted(requested) == [0, 2, 4, 6]
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_empty_paged_query_keeps_columns(integration):
+
+    integration.asyncClients["dev"] = opsQueryServer([], ["Specimen ID", "Specimen Label"], [])
+
+    pages = list(integration.runQueryPaged("dev", -1, "select ..."))
+
+    assert len(pages) == 1
+    assert pages[0].empty
+    assert pages[0].columns.tolist() == ["Specimen ID", "Specimen Label"]
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_journal_is_not_replayed_onto_a_different_file(integration):
+
+    pd.DataFrame({"PPID": ["a", "b"], "First Name": ["Ann", "Bob"]}).to_csv("upload.csv", index=False)
+
+    #  a run which crashes after matching, before its progress is written into the file
+    integration.dfImport("upload.csv", "dev")
+    integration.recordDF["Participant ID"] = ["101", "102"]
+    integration.journalRecord(integration.recordDF.index, ["Participant ID"])
+
+    pd.DataFrame({"PPID": ["c", "d"], "First Name": ["Cat", "Dan"]}).to_csv("upload.csv", index=False)
+    integration.dfImport("upload.csv", "dev")
+
+    assert "Participant ID" not in integration.recordDF.columns
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_journal_is_replayed_onto_the_same_file(integration):
+
+    pd.DataFrame({"PPID": ["a", "b"], "First Name": ["Ann", "Bob"]}).to_csv("upload.csv", index=False)
+
+    integration.dfImport("upload.csv", "dev")
+    integration.recordDF["Participant ID"] = ["101", "102"]
+    integration.journalRecord(integration.recordDF.index, ["Participant ID"])
+
+    integration.dfImport("upload.csv", "dev")
+
+    assert integration.recordDF["Participant ID"].tolist() == ["101", "102"]
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_concurrent_look_ups_share_one_client_and_index(integration):
+
+    with ThreadPoolExecutor(8) as executor:
+        clients = set(map(id, executor.map((lambda _: integration.getClient("test")), range(64))))
+        indexes = set(map(id, executor.map((lambda _: integration.getIdentityIndex("test")), range(64))))
+
+    assert len(clients) == 1
+    assert len(indexes) == 1
+
+
+#  ---------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("tableFormat", ["csv", "parquet"])
+def test_extension_plan_reads_typed_form_ids(integration, tableFormat):
+
+    if tableFormat == "parquet":
+        pytest.importorskip("pyarrow")
+
+    integration.tableFormat = tableFormat
+    integration.currentEnv = "dev"
+
+    #  the blank ID of a form missing from dev is what used to make the IDs come out as floats
+    formDF = pd.DataFrame(
+        {"formName": ["Participant Extras", "Visit Extras"], "devShortName": ["partExtras", None], "dev": [12, None]}
+    )
+    fieldDF = pd.DataFrame({"formName": ["Participant Extras"], "fieldName": ["Smoker"], "dev": ["smoker"]})
+
+    integration.writeTable(formDF, integration.formOutPath, idCols=["dev"])
+    integration.writeTable(fieldDF, integration.fieldOutPath)
+
+    plan = integration.compileExtensionPlan(
+        {"formId": 12, "formName": "partExtras"}, ["PPID", "Participant Extras#Smoker"]
+    )
+
+    assert plan == [("Participant Extras#Smoker", "field", ["smoker"])]
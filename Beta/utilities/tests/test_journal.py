@@ -0,0 +1,40 @@
+import pandas as pd
+
+from journal import RecordJournal
+
+
+def test_replays_changes_for_the_same_file(tmp_path):
+
+    path = str(tmp_path / "upload.csv.jsonl")
+
+    journal = RecordJournal(path, "hashA")
+    journal.append([0, 1], ["Participant ID"], [["101"], ["102"]])
+    journal.close()
+
+    df = pd.DataFrame({"PPID": ["a", "b"]})
+    journal = RecordJournal(path, "hashA")
+
+    assert journal.replay(df) == 1
+    assert df["Participant ID"].tolist() == ["101", "102"]
+
+    journal.close()
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_ignores_changes_for_another_file_of_the_same_name(tmp_path):
+
+    path = str(tmp_path / "upload.csv.jsonl")
+
+    journal = RecordJournal(path, "hashA")
+    journal.append([0, 1], ["Participant ID"], [["101"], ["102"]])
+    journal.close()
+
+    df = pd.DataFrame({"PPID": ["c", "d"]})
+    journal = RecordJournal(path, "hashB")
+
+    assert journal.replay(df) == 0
+    assert "Participant ID" not in df.columns
+
+    journal.close()
@@ -0,0 +1,82 @@
+import threading
+
+import httpx
+
+from transport import RetryPolicy
+
+
+def reply(status, method="POST", text=""):
+
+    return httpx.Response(status, text=text, request=httpx.Request(method, "https://ops.example/rest/ng/"))
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_post_gateway_error_is_not_retried():
+
+    policy = RetryPolicy(attempts=5, baseDelay=0, maxDelay=0, budget=10)
+
+    assert not policy.shouldRetry(reply(504), 0, "POST")
+    assert not policy.shouldRetry(reply(502), 0, "POST")
+    assert policy.remaining == 10
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_idempotent_gateway_error_is_retried():
+
+    policy = RetryPolicy(attempts=5, baseDelay=0, maxDelay=0, budget=10)
+
+    assert policy.shouldRetry(reply(504, "GET"), 0, "GET")
+    assert policy.shouldRetry(reply(503, "PUT"), 0, "PUT")
+    assert policy.remaining == 8
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_post_deadlock_is_retried():
+
+    policy = RetryPolicy(attempts=5, baseDelay=0, maxDelay=0, budget=10)
+
+    assert policy.shouldRetry(reply(500, text="Deadlock found when trying to get lock"), 0, "POST")
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_post_transport_errors():
+
+    policy = RetryPolicy(attempts=5, baseDelay=0, maxDelay=0, budget=10)
+
+    assert policy.isRetryable(httpx.ConnectError("refused"), "POST")
+    assert not policy.isRetryable(httpx.ReadTimeout("timed out"), "POST")
+    assert policy.isRetryable(httpx.ReadTimeout("timed out"), "GET")
+
+
+#  ---------------------------------------------------------------------
+
+
+def test_budget_is_charged_once_per_retry_across_threads():
+
+    policy = RetryPolicy(attempts=5, baseDelay=0, maxDelay=0, budget=100)
+    retried = []
+    start = threading.Barrier(8)
+
+    def retryAll():
+
+        start.wait()
+        retried.extend(policy.shouldRetry(reply(503, "GET"), 0, "GET") for _ in range(50))
+
+    threads = [threading.Thread(target=retryAll) for _ in range(8)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert sum(retried) == 100
+    assert policy.remaining == 0
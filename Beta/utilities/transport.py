@@ -0,0 +1,535 @@
+import os
+import json
+import random
+import asyncio
+import sqlite3
+import threading
+import time
+
+import httpx
+
+
+class ConcurrencyController:
+    """Adapts the number of async requests sent to OpS at once using additive-increase/multiplicative-decrease (AIMD)"""
+
+    def __init__(self, initial, minimum, maximum, latencySpikeFactor=2, smoothing=0.2):
+
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latencySpikeFactor = latencySpikeFactor
+        self.smoothing = smoothing
+        self.averageLatency = None
+        self.strained = False
+
+    #  ---------------------------------------------------------------------
+
+    def isOverloaded(self, reply):
+        """Checks whether a single reply indicates the server is struggling (5xx or MySQL deadlock)"""
+
+        if isinstance(reply, Exception):
+            return True
+
+        return reply.status_code >= 500 or (reply.is_error and "deadlock" in reply.text.lower())
+
+    #  ---------------------------------------------------------------------
+
+    def noteOverload(self):
+        """Records that a request in the current chunk hit an overloaded server, even if a retry later succeeded"""
+
+        self.strained = True
+
+    #  ---------------------------------------------------------------------
+
+    def observe(self, replies, elapsed):
+        """Adjusts the limit given the replies and wall time of the last chunk -- grows by one while healthy, halves on errors or latency spikes"""
+
+        isSpike = self.averageLatency is not None and elapsed > self.averageLatency * self.latencySpikeFactor
+
+        if self.strained or any(self.isOverloaded(reply) for reply in replies) or isSpike:
+            self.limit = max(self.minimum, self.limit // 2)
+
+        else:
+            self.limit = min(self.maximum, self.limit + 1)
+
+        #  spikes are kept out of the running average so a single slow chunk doesn't raise the bar for the next one
+        if not isSpike:
+            self.averageLatency = (
+                elapsed
+                if self.averageLatency is None
+                else (self.smoothing * elapsed) + ((1 - self.smoothing) * self.averageLatency)
+            )
+
+        self.strained = False
+
+        return self.limit
+
+
+#  ---------------------------------------------------------------------
+
+
+class EventLoopThread:
+    """Runs one asyncio event loop in a background thread, so sync code can submit coroutines to it rather than building a new loop each time"""
+
+    def __init__(self):
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="OpSEventLoop", daemon=True)
+        self.thread.start()
+
+    #  ---------------------------------------------------------------------
+
+    def run(self, coro):
+        """Runs the coroutine on the background loop and blocks until it returns"""
+
+        if threading.current_thread() is self.thread:
+            coro.close()
+            raise RuntimeError(
+                "Blocking on the shared event loop from within it would deadlock -- await the coroutine instead"
+            )
+
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+eventLoop = None
+eventLoopLock = threading.Lock()
+
+
+def getEventLoop():
+    """Returns the event loop thread shared by every Integration, starting it on first use"""
+
+    global eventLoop
+
+    with eventLoopLock:
+
+        if eventLoop is None:
+            eventLoop = EventLoopThread()
+
+    return eventLoop
+
+
+#  ---------------------------------------------------------------------
+
+
+def rewindFiles(files):
+    """Seeks any open files in a request's files argument back to the start, so the request can be sent again"""
+
+    if not files:
+        return
+
+    entries = files.values() if isinstance(files, dict) else [entry for _, entry in files]
+
+    for entry in entries:
+        fileObj = entry[1] if isinstance(entry, tuple) else entry
+
+        if hasattr(fileObj, "seek"):
+            fileObj.seek(0)
+
+
+#  ---------------------------------------------------------------------
+
+
+class RetryPolicy:
+    """Decides which failed requests are worth retrying and how long to wait, drawing on a retry budget shared by the current job"""
+
+    def __init__(self, attempts, baseDelay, maxDelay, budget):
+
+        self.attempts = attempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.budget = budget
+        self.remaining = budget
+        self.lock = threading.Lock()
+
+    #  ---------------------------------------------------------------------
+
+    def resetBudget(self):
+        """Refills the retry budget -- called at the start of each job (i.e. each imported file)"""
+
+        with self.lock:
+            self.remaining = self.budget
+
+    #  ---------------------------------------------------------------------
+
+    def isRetryable(self, reply, method="GET"):
+        """Checks whether a reply (or the exception raised in place of one) failed for a transient reason, and is safe to send again"""
+
+        idempotent = method.upper() in ["GET", "HEAD", "OPTIONS", "PUT", "DELETE"]
+
+        #  a non-idempotent request (i.e. a POST create) which timed out, was cut off, or got a gateway error may well have been carried
+        #  out by the server, so it's only sent again if it never reached the server at all, or the server rolled it back (a deadlock)
+        if isinstance(reply, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return True
+
+        if isinstance(reply, httpx.TransportError):
+            return idempotent
+
+        if isinstance(reply, Exception):
+            return False
+
+        if reply.is_error and "deadlock" in reply.text.lower():
+            return True
+
+        return idempotent and reply.status_code in [502, 503, 504]
+
+    #  ---------------------------------------------------------------------
+
+    def shouldRetry(self, reply, attempt, method="GET"):
+        """Checks whether the given attempt should be retried, and charges the retry budget if so"""
+
+        if attempt + 1 >= self.attempts or not self.isRetryable(reply, method):
+            return False
+
+        #  requests are retried from several threads at once (i.e. concurrent look ups), so the budget is checked and charged in one step
+        with self.lock:
+
+            if self.remaining <= 0:
+                return False
+
+            self.remaining -= 1
+            return True
+
+    #  ---------------------------------------------------------------------
+
+    def delay(self, attempt):
+        """Returns a randomized ("full jitter") exponential backoff, so retries from the same chunk don't hit the server in lockstep"""
+
+        return random.uniform(0, min(self.maxDelay, self.baseDelay * (2**attempt)))
+
+
+#  ---------------------------------------------------------------------
+
+
+class TokenManager:
+    """Fetches OpS session tokens lazily, per env, and refreshes them before they expire -- indexed like the dict of tokens it replaces"""
+
+    def __init__(self, envs, baseURL, authExtension, refreshAfter, timeout=20):
+
+        self.envs = envs
+        self.baseURL = baseURL
+        self.authExtension = authExtension
+        self.refreshAfter = refreshAfter
+        self.timeout = timeout
+        self.tokens = {}
+        self.issued = {}
+        self.lock = threading.Lock()
+
+    #  ---------------------------------------------------------------------
+
+    def __getitem__(self, env):
+        """Returns the token for the given env, logging in first if there isn't one yet or it is due to expire"""
+
+        with self.lock:
+
+            if env not in self.tokens or time.monotonic() - self.issued[env] > self.refreshAfter:
+                self.login(env)
+
+            return self.tokens[env]
+
+    #  ---------------------------------------------------------------------
+
+    def __contains__(self, env):
+
+        return env in self.envs
+
+    #  ---------------------------------------------------------------------
+
+    def keys(self):
+        """Returns the envs tokens can be fetched for, without logging in to any of them"""
+
+        return self.envs.keys()
+
+    #  ---------------------------------------------------------------------
+
+    def login(self, env):
+        """Logs in to the given env and stores the resulting token -- callers are expected to hold the lock"""
+
+        base = self.baseURL.replace("_", "") if env == "prod" else self.baseURL.replace("_", env)
+        reply = httpx.post(f"{base}{self.authExtension}", json=self.envs[env], timeout=self.timeout)
+        reply.raise_for_status()
+
+        self.tokens[env] = reply.json()["token"]
+        self.issued[env] = time.monotonic()
+
+    #  ---------------------------------------------------------------------
+
+    def refresh(self, env, staleToken=None):
+        """Fetches a new token for the given env, unless another request has already replaced the stale one, and returns it"""
+
+        with self.lock:
+
+            if staleToken is None or self.tokens.get(env) == staleToken:
+                self.login(env)
+
+            return self.tokens[env]
+
+    #  ---------------------------------------------------------------------
+
+    def refreshAll(self):
+        """Fetches new tokens for every env which has been logged in to so far"""
+
+        for env in list(self.tokens.keys()):
+            self.refresh(env)
+
+
+#  ---------------------------------------------------------------------
+
+
+class TokenBucket:
+    """Allows requests through at a steady rate, with short bursts of up to its capacity"""
+
+    def __init__(self, rate, burst):
+
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    #  ---------------------------------------------------------------------
+
+    def reserve(self):
+        """Takes a token and returns how many seconds the caller must wait before sending -- 0 if one was available"""
+
+        with self.lock:
+
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+
+            return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+#  ---------------------------------------------------------------------
+
+
+class RateLimiter:
+    """Keeps a token bucket for each env and endpoint class, so bulk jobs can't use more than their share of the server"""
+
+    def __init__(self, limits, envLimits=None):
+
+        self.limits = limits
+        self.envLimits = envLimits or {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    #  ---------------------------------------------------------------------
+
+    def endpointClass(self, url):
+        """Returns the endpoint class a URL belongs to (i.e. "query" or "specimens"), or "default" if it has no limit of its own"""
+
+        segments = httpx.URL(url).path.split("/")
+
+        for endpoint in self.limits.keys():
+
+            if endpoint in segments:
+                return endpoint
+
+        return "default"
+
+    #  ---------------------------------------------------------------------
+
+    def reserve(self, env, url):
+        """Returns how many seconds a request to the URL must wait so the env and endpoint class stay within their limits"""
+
+        endpoint = self.endpointClass(url)
+
+        with self.lock:
+
+            if (env, endpoint) not in self.buckets:
+                limit = self.envLimits.get(env, {}).get(endpoint, self.limits.get(endpoint))
+                self.buckets[(env, endpoint)] = TokenBucket(*limit) if limit else None
+
+            bucket = self.buckets[(env, endpoint)]
+
+        return bucket.reserve() if bucket else 0
+
+
+#  ---------------------------------------------------------------------
+
+
+class RequestCoalescer:
+    """Shares one reply between identical GET requests which are in flight at the same time, or repeated within a short TTL"""
+
+    def __init__(self, ttl):
+
+        self.ttl = ttl
+        self.replies = {}
+        self.inFlight = {}
+        self.lock = threading.Lock()
+
+    #  ---------------------------------------------------------------------
+
+    def fetch(self, env, url, params, send):
+        """Returns a recent successful reply for the same env, URL, and params if there is one, otherwise waits on (or becomes) the request in flight"""
+
+        key = (env, url, json.dumps(params, sort_keys=True, default=str))
+
+        with self.lock:
+
+            cached = self.replies.get(key)
+
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+
+            event = self.inFlight.get(key)
+            isLeader = event is None
+
+            if isLeader:
+                event = self.inFlight[key] = threading.Event()
+
+        if not isLeader:
+            event.wait()
+            return self.fetch(env, url, params, send)
+
+        try:
+            reply = send()
+
+            #  errors aren't shared, so the next caller gets to try for itself
+            if not reply.is_error:
+                with self.lock:
+                    self.replies[key] = (time.monotonic() + self.ttl, reply)
+
+            return reply
+
+        finally:
+            with self.lock:
+                del self.inFlight[key]
+
+            event.set()
+
+    #  ---------------------------------------------------------------------
+
+    def invalidate(self, env, url=None):
+        """Forgets shared replies for the given URL in the env, or for the whole env if no URL is given"""
+
+        with self.lock:
+
+            for key in [key for key in self.replies.keys() if key[0] == env and (url is None or key[1] == url)]:
+                del self.replies[key]
+
+
+#  ---------------------------------------------------------------------
+
+
+class ResponseCache:
+    """Keeps successful replies from slow-changing metadata endpoints on disk, so later runs can reuse them -- bounded in size, least recently used first out"""
+
+    def __init__(self, path, ttls, maxEntries):
+
+        self.ttls = ttls
+        self.maxEntries = maxEntries
+        self.lock = threading.Lock()
+
+        #  the cache may be opened before Settings.buildEnv has created the resources directory
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, env TEXT, url TEXT, status INTEGER, headers TEXT, content BLOB, storedAt REAL, usedAt REAL)"
+        )
+        self.connection.commit()
+
+    #  ---------------------------------------------------------------------
+
+    def ttlFor(self, url):
+        """Returns the TTL for the endpoint a URL belongs to, or None if replies from it aren't cached"""
+
+        segments = httpx.URL(url).path.split("/")
+
+        #  checked in the order given in Settings, so more specific endpoints (i.e. "definition") should come before broader ones
+        for endpoint, ttl in self.ttls.items():
+
+            if endpoint in segments:
+                return ttl
+
+        return None
+
+    #  ---------------------------------------------------------------------
+
+    def makeKey(self, env, url, params):
+
+        return json.dumps([env, url, params], sort_keys=True, default=str)
+
+    #  ---------------------------------------------------------------------
+
+    def get(self, env, url, params):
+        """Returns the cached reply and whether it is still within its TTL, or (None, False) if nothing is cached"""
+
+        key = self.makeKey(env, url, params)
+
+        with self.lock:
+
+            row = self.connection.execute(
+                "SELECT status, headers, content, storedAt FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return None, False
+
+            self.connection.execute("UPDATE responses SET usedAt = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+
+        status, headers, content, storedAt = row
+        reply = httpx.Response(status, headers=json.loads(headers), content=content, request=httpx.Request("GET", url))
+
+        return reply, time.time() - storedAt < self.ttlFor(url)
+
+    #  ---------------------------------------------------------------------
+
+    def put(self, env, url, params, reply):
+        """Stores a reply, evicting the least recently used entries once the cache is over its size limit"""
+
+        key = self.makeKey(env, url, params)
+        #  content is stored decoded, so the headers describing the encoded body no longer apply
+        headers = {
+            name: val
+            for name, val in reply.headers.items()
+            if name.lower() not in ["content-encoding", "content-length"]
+        }
+        headers = json.dumps(headers)
+        now = time.time()
+
+        with self.lock:
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, env, url, reply.status_code, headers, reply.content, now, now),
+            )
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY usedAt DESC LIMIT -1 OFFSET ?)",
+                (self.maxEntries,),
+            )
+            self.connection.commit()
+
+    #  ---------------------------------------------------------------------
+
+    def renew(self, env, url, params):
+        """Restarts the TTL of a cached reply which the server has confirmed is unchanged"""
+
+        with self.lock:
+
+            self.connection.execute(
+                "UPDATE responses SET storedAt = ? WHERE key = ?", (time.time(), self.makeKey(env, url, params))
+            )
+            self.connection.commit()
+
+    #  ---------------------------------------------------------------------
+
+    def invalidate(self, env=None, url=None):
+        """Removes cached replies for the given env and/or URL prefix, or everything if neither is given"""
+
+        query = "DELETE FROM responses WHERE (? IS NULL OR env = ?) AND (? IS NULL OR substr(url, 1, length(?)) = ?)"
+
+        with self.lock:
+
+            self.connection.execute(query, (env, env, url, url, url))
+            self.connection.commit()
+
+    #  ---------------------------------------------------------------------
+
+    def close(self):
+
+        with self.lock:
+            self.connection.close()